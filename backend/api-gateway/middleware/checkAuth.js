@@ -5,7 +5,9 @@ import axios from "axios";
  * Middleware to verify user authentication for API Gateway routes.
  * 
  * - First checks if a session user exists (req.session.user)
- * - Fallback: verifies Bearer token via the AUTH service `/me` endpoint
+ * - Fallback: verifies Bearer token via the AUTH service `/me` endpoint, unless
+ *   SERVICES_VERIFY_JWT=true: then the token is forwarded as is and each service verifies
+ *   it locally against the auth service's public key (djangoBackend/<service>/jwt_auth.py)
  * - Attaches user info to `req.user` and `req.headers['x-user']` for downstream services
  *
  * @param {Object} req - Express request object
@@ -29,6 +31,12 @@ export default async function checkAuth(req, res, next) {
     }
     const token = authHeader.split(' ')[1];
 
+    if (process.env.SERVICES_VERIFY_JWT === "true") {
+      // Downstream builds x-user from the verified token; never pass a client-supplied one
+      delete req.headers['x-user'];
+      return next();
+    }
+
     // Verify token via AUTH service /me endpoint
     const response = await axios.get(`${process.env.AUTH_URL}/api/me`, {
       headers: { Authorization: `Bearer ${token}` },
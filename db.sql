@@ -259,14 +259,19 @@ CREATE TABLE `tokens` (
 --
 ALTER TABLE `admin`
   ADD PRIMARY KEY (`id`),
-  ADD UNIQUE KEY `email` (`email`);
+  ADD UNIQUE KEY `email` (`email`),
+  ADD KEY `idx_admin_created_at` (`created_at`),
+  ADD KEY `idx_admin_email` (`email`,`isDeleted`),
+  ADD KEY `idx_admin_cnic` (`cnic`,`isDeleted`),
+  ADD KEY `idx_admin_phone` (`phone`,`isDeleted`);
 
 --
 -- Indexes for table `course`
 --
 ALTER TABLE `course`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `fk_course_teacher` (`teacherId`);
+  ADD KEY `fk_course_teacher` (`teacherId`),
+  ADD KEY `idx_course_created_at` (`created_at`);
 
 --
 -- Indexes for table `enrollment`
@@ -274,21 +279,30 @@ ALTER TABLE `course`
 ALTER TABLE `enrollment`
   ADD PRIMARY KEY (`id`),
   ADD UNIQUE KEY `unique_student_course` (`studentId`,`courseId`),
-  ADD KEY `fk_enroll_course` (`courseId`);
+  ADD KEY `fk_enroll_course` (`courseId`),
+  ADD KEY `idx_enrollment_created_at` (`created_at`);
 
 --
 -- Indexes for table `student`
 --
 ALTER TABLE `student`
   ADD PRIMARY KEY (`id`),
-  ADD UNIQUE KEY `email` (`email`);
+  ADD UNIQUE KEY `email` (`email`),
+  ADD KEY `idx_student_created_at` (`created_at`),
+  ADD KEY `idx_student_email` (`email`,`isDeleted`),
+  ADD KEY `idx_student_cnic` (`cnic`,`isDeleted`),
+  ADD KEY `idx_student_phone` (`phone`,`isDeleted`);
 
 --
 -- Indexes for table `teacher`
 --
 ALTER TABLE `teacher`
   ADD PRIMARY KEY (`id`),
-  ADD UNIQUE KEY `email` (`email`);
+  ADD UNIQUE KEY `email` (`email`),
+  ADD KEY `idx_teacher_created_at` (`created_at`),
+  ADD KEY `idx_teacher_email` (`email`,`isDeleted`),
+  ADD KEY `idx_teacher_cnic` (`cnic`,`isDeleted`),
+  ADD KEY `idx_teacher_phone` (`phone`,`isDeleted`);
 
 --
 -- Indexes for table `tokens`
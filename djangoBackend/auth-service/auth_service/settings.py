@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import pymysql
 import os
+import sys
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -19,6 +20,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
 pymysql.install_as_MySQLdb()
 
+# Modules shared by the Django services (djangoBackend/portal_common)
+sys.path.append(str(BASE_DIR.parent))
+
 
 from pathlib import Path
 
@@ -60,6 +64,8 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    # Outermost, so it sees the whole request (Server-Timing / per-request timing log)
+    'portal_common.timing.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -124,8 +130,77 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+REST_FRAMEWORK = {
+    # orjson codec with a stdlib fallback (portal_common/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "portal_common.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "portal_common.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Shared with the other services: registering a user moves the table generation the
+    # read service keys its response cache and search index on. Also carries the revoked-jti
+    # log the /me token cache and the other services check tokens against. Login throttle
+    # counters and lockouts live here too, so every auth worker enforces the same lockouts.
+    # The default backend (portal_common/filecache.py) keeps incr atomic and never evicts live
+    # keys, which the counters and lockouts rely on; across hosts use Redis without an eviction
+    # policy.
+    "shared": {
+        "BACKEND": os.getenv("SHARED_CACHE_BACKEND", "portal_common.filecache.SharedFileCache"),
+        "LOCATION": os.getenv("SHARED_CACHE_LOCATION", str(BASE_DIR.parent / ".shared_cache")),
+        "TIMEOUT": None,
+    },
+}
+
+# /me verified-token cache (authenticationserv/token_cache.py): entry cap and max entry age
+# (seconds, never past the JWT exp)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 300))
+# How often (seconds) the revoked-jti log is re-read; a token revoked by another process is
+# still answered from the /me cache for this long at most
+JWT_DENYLIST_POLL = float(os.getenv("JWT_DENYLIST_POLL", 1.0))
+
+# --- Token signing ---
+# PEM RSA private key (inline or JWT_PRIVATE_KEY_FILE). When set, tokens are signed RS256 so the
+# other services can verify them locally with the public half (their JWT_PUBLIC_KEY); unset
+# keeps HS256 with SECRET_KEY, which only this service can check.
+JWT_PRIVATE_KEY_FILE = os.getenv("JWT_PRIVATE_KEY_FILE")
+JWT_PRIVATE_KEY = Path(JWT_PRIVATE_KEY_FILE).read_text() if JWT_PRIVATE_KEY_FILE else os.getenv("JWT_PRIVATE_KEY")
+
+# Password hashing pool (portal_common/hashing.py): worker threads (default one per core) and how many
+# more hashes may wait for one before requests are shed with 503
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", 0)) or None
+HASH_POOL_QUEUE = int(os.getenv("HASH_POOL_QUEUE", 64))
+
+# bcrypt cost policy: the highest rounds whose hash fits BCRYPT_TARGET_MS on this host, between
+# BCRYPT_MIN_ROUNDS and BCRYPT_MAX_ROUNDS, calibrated once and kept in the shared cache for
+# every service (delete its bcrypt-rounds key to recalibrate); BCRYPT_ROUNDS pins it instead.
+# Keep these the same in auth, create and update.
+BCRYPT_TARGET_MS = int(os.getenv("BCRYPT_TARGET_MS", 100))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", 10))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", 14))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 0)) or None
+
+# Share of requests measured by the timing middleware (Server-Timing header + "myproject.timing"
+# log record). 0 turns it off at the cost of one random() call per request.
+TIMING_SAMPLE_RATE = float(os.getenv("TIMING_SAMPLE_RATE", 0.0))
+
 import os
-LOG_DIR = os.path.join(BASE_DIR, "logs")
+import tempfile
+# LOG_DIR overrides; test runs log to the temp dir so they leave nothing in the tree
+LOG_DIR = os.getenv("LOG_DIR") or (
+    os.path.join(tempfile.gettempdir(), f"{BASE_DIR.name}-test-logs") if sys.argv[1:2] == ["test"]
+    else os.path.join(BASE_DIR, "logs")
+)
 os.makedirs(LOG_DIR, exist_ok=True)
 
 LOGGING = {
@@ -0,0 +1,38 @@
+# authenticationserv/revocation.py
+"""
+Publishes revoked tokens to the services that verify bearer tokens themselves
+(portal_common.jwt_auth): each revocation is appended to a log in the shared cache as (jti, exp). The log
+is split into REVOKED_WINDOW-second windows by token expiry, each numbered from 1, and a window
+is kept one window past its last token's expiry. Readers fetch only the entries past the last
+number they saw, and treat a missing entry of a live window as a lost revocation.
+"""
+import logging
+import time
+import jwt
+from django.core.cache import caches
+from authenticationserv.utils import decode_token
+from portal_common.jwt_auth import REVOKED_COUNT_KEY, REVOKED_ENTRY_KEY, REVOKED_WINDOW
+
+logger = logging.getLogger("myproject")
+
+
+def revoke_tokens(tokens):
+    shared = caches["shared"]
+    now = time.time()
+    for token in tokens:
+        try:
+            # Signature still checked: only tokens we issued get onto the list
+            claims = decode_token(token, verify_exp=False)
+        except jwt.InvalidTokenError:
+            continue
+        jti, exp = claims.get("jti"), claims.get("exp")
+        if not jti or exp <= now:
+            continue
+        window = int(exp // REVOKED_WINDOW)
+        timeout = int((window + 2) * REVOKED_WINDOW - now)
+        try:
+            shared.add(REVOKED_COUNT_KEY.format(window), 0, timeout=timeout)
+            number = shared.incr(REVOKED_COUNT_KEY.format(window))
+            shared.set(REVOKED_ENTRY_KEY.format(window, number), (jti, exp), timeout=timeout)
+        except Exception as e:
+            logger.error(f"Failed to publish revoked token {jti}: {e}", exc_info=True)
@@ -1,3 +1,266 @@
-from django.test import TestCase
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
 
-# Create your tests here.
+from authenticationserv import throttling
+from authenticationserv.revocation import revoke_tokens
+from authenticationserv.throttling import (
+    BUCKET_TIME, FAILURES_KEY, LOCK_TIME, MAX_ATTEMPTS,
+    _bucket, _ident, add_failed_attempt, check_throttle, reset_attempts,
+)
+from authenticationserv.token_cache import TokenCache, token_cache
+from authenticationserv.utils import decode_token, generate_token
+from portal_common import hashing
+from portal_common.hashing import HashingBusy, HashPool, check_password, hash_password
+from portal_common.jwt_auth import Denylist
+
+
+class SharedCacheMixin:
+    """Points a file-based "shared" cache at a scratch directory for the test."""
+    def setUp(self):
+        super().setUp()
+        shared = dict(settings.CACHES["shared"])
+        if "file" in shared["BACKEND"].lower():
+            shared["LOCATION"] = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, shared["LOCATION"], True)
+        self.use_shared(shared)
+        caches["shared"].clear()
+
+    def use_shared(self, shared):
+        override = override_settings(CACHES={**settings.CACHES, "shared": shared})
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+@override_settings(JWT_DENYLIST_POLL=0, TOKEN_CACHE_TTL=300, TOKEN_CACHE_SIZE=3)
+class TokenCacheTests(SharedCacheMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        # Two auth processes sharing one cache
+        self.here, self.there = TokenCache(), TokenCache()
+        self.tokens = {}
+        # Fresh revoked-jti state, since the shared cache was just emptied
+        patcher = mock.patch("authenticationserv.token_cache.denylist", Denylist())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def issue(self, name):
+        token = generate_token({"id": len(self.tokens) + 1, "name": name, "email": f"{name}@x.io", "type": "student"})
+        self.tokens[name] = token
+        return token, decode_token(token)
+
+    def test_hit_until_the_jwt_expires(self):
+        token, payload = self.issue("a")
+        self.here.put(token, payload)
+        self.assertEqual(self.here.get(token), payload)
+        self.here.put("b", {**payload, "exp": time.time() - 1})
+        self.assertIsNone(self.here.get("b"))
+
+    def test_least_recently_used_goes_first(self):
+        issued = [self.issue(name) for name in "abcd"]
+        for token, payload in issued[:3]:
+            self.here.put(token, payload)
+        self.here.get(issued[0][0])
+        self.here.put(*issued[3])
+        self.assertIsNone(self.here.get(issued[1][0]))
+        self.assertIsNotNone(self.here.get(issued[0][0]))
+
+    def test_token_without_jti_is_not_cached(self):
+        token, payload = self.issue("a")
+        del payload["jti"]
+        self.here.put(token, payload)
+        self.assertIsNone(self.here.get(token))
+
+    def test_revocation_elsewhere_drops_only_that_token(self):
+        (a, a_payload), (b, b_payload) = self.issue("a"), self.issue("b")
+        for cache in (self.here, self.there):
+            cache.put(a, a_payload)
+            cache.put(b, b_payload)
+        # What logout does in the other process
+        self.there.revoke([a])
+        revoke_tokens([a])
+        self.assertIsNone(self.there.get(a))
+        self.assertIsNone(self.here.get(a))
+        self.assertEqual(self.here.get(b), b_payload)
+
+    def test_me_answers_a_cached_token_without_the_database(self):
+        token, payload = self.issue("a")
+        token_cache.put(token, payload)
+        self.addCleanup(token_cache.entries.clear)
+        response = self.client.get("/api/me", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"user": payload})
+
+    def test_me_refuses_a_cached_token_revoked_elsewhere(self):
+        token, payload = self.issue("a")
+        token_cache.put(token, payload)
+        self.addCleanup(token_cache.entries.clear)
+        revoke_tokens([token])
+        self.assertIsNone(token_cache.get(token))
+
+
+@override_settings(HASH_POOL_WORKERS=1, HASH_POOL_QUEUE=1, BCRYPT_ROUNDS=4)
+class HashPoolTests(SimpleTestCase):
+    def test_hash_roundtrip(self):
+        hashed = hash_password("secret")
+        self.assertTrue(check_password("secret", hashed))
+        self.assertFalse(check_password("other", hashed))
+
+    def test_full_pool_sheds_unless_told_to_wait(self):
+        pool, release = HashPool(), threading.Event()
+        running = pool.submit(release.wait)
+        queued = pool.submit(release.wait)
+        with self.assertRaises(HashingBusy):
+            pool.submit(release.wait)
+        threading.Timer(0.05, release.set).start()
+        # A bulk insert's later passwords wait for a slot instead
+        self.assertTrue(pool.submit(release.wait, wait=True).result())
+        self.assertTrue(running.result() and queued.result())
+
+
+@override_settings(BCRYPT_ROUNDS=None)
+class CostPolicyTests(SharedCacheMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        hashing._rounds = None
+        self.addCleanup(setattr, hashing, "_rounds", None)
+        caches["shared"].set(hashing.ROUNDS_KEY, 11)
+
+    def test_only_weaker_hashes_are_replaced(self):
+        self.assertTrue(hashing.needs_rehash("$2b$10$" + "x" * 53))
+        self.assertFalse(hashing.needs_rehash("$2b$11$" + "x" * 53))
+        self.assertFalse(hashing.needs_rehash("$2b$12$" + "x" * 53))
+        self.assertTrue(hashing.needs_rehash("plaintext"))
+
+    def test_pinned_cost_may_lower_stronger_hashes(self):
+        with self.settings(BCRYPT_ROUNDS=10):
+            self.assertTrue(hashing.needs_rehash("$2b$12$" + "x" * 53))
+            self.assertFalse(hashing.needs_rehash("$2b$10$" + "x" * 53))
+
+    def test_every_process_follows_the_shared_cost(self):
+        self.assertEqual(hashing.cost_rounds(), 11)
+        caches["shared"].set(hashing.ROUNDS_KEY, 12)
+        self.assertEqual(hashing.cost_rounds(), 11)
+        hashing._rounds_checked_at -= hashing.ROUNDS_RECHECK
+        self.assertEqual(hashing.cost_rounds(), 12)
+
+    def test_concurrent_first_use_calibrates_once(self):
+        caches["shared"].delete(hashing.ROUNDS_KEY)
+        # Slow enough that unguarded threads would all find no cost and calibrate
+        with mock.patch.object(hashing, "calibrate", side_effect=lambda: time.sleep(0.05) or 10) as calibrate:
+            threads = [threading.Thread(target=hashing.cost_rounds) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(calibrate.call_count, 1)
+
+    def test_published_cost_does_not_expire(self):
+        caches["shared"].delete(hashing.ROUNDS_KEY)
+        with mock.patch.object(hashing, "calibrate", return_value=10):
+            self.assertEqual(hashing.cost_rounds(), 10)
+        with mock.patch("time.time", return_value=time.time() + 365 * 24 * 3600):
+            self.assertEqual(caches["shared"].get(hashing.ROUNDS_KEY), 10)
+
+
+def fail_repeatedly(email, times):
+    for _ in range(times):
+        add_failed_attempt(email)
+
+
+class LoginThrottleTests(SharedCacheMixin, SimpleTestCase):
+    """
+    Against the configured "shared" backend. time.time is frozen and moved by hand, which the
+    file backend's expiry checks follow too.
+    """
+    EMAIL = "victim@example.com"
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1_700_000_000.0
+        patcher = mock.patch("time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_locks_after_max_attempts(self):
+        fail_repeatedly(self.EMAIL, MAX_ATTEMPTS - 1)
+        self.assertTrue(check_throttle(self.EMAIL))
+        add_failed_attempt(self.EMAIL)
+        self.assertFalse(check_throttle(self.EMAIL))
+        # Same account however the email is typed
+        self.assertFalse(check_throttle(" Victim@Example.com"))
+        self.assertTrue(check_throttle("someone@example.com"))
+
+    def test_lock_expires(self):
+        fail_repeatedly(self.EMAIL, MAX_ATTEMPTS)
+        self.now += LOCK_TIME - 1
+        self.assertFalse(check_throttle(self.EMAIL))
+        self.now += 2
+        self.assertTrue(check_throttle(self.EMAIL))
+
+    def test_failures_count_across_buckets_within_window(self):
+        add_failed_attempt(self.EMAIL)
+        self.now += LOCK_TIME // 2
+        add_failed_attempt(self.EMAIL)
+        self.now += LOCK_TIME // 2 - BUCKET_TIME
+        add_failed_attempt(self.EMAIL)
+        self.assertFalse(check_throttle(self.EMAIL))
+
+    def test_failures_slide_out_of_window(self):
+        fail_repeatedly(self.EMAIL, MAX_ATTEMPTS - 1)
+        self.now += LOCK_TIME + BUCKET_TIME
+        add_failed_attempt(self.EMAIL)
+        self.assertTrue(check_throttle(self.EMAIL))
+
+    def test_failure_buckets_keep_their_expiry(self):
+        add_failed_attempt(self.EMAIL)
+        add_failed_attempt(self.EMAIL)
+        key = FAILURES_KEY.format(_ident(self.EMAIL), _bucket(self.now))
+        self.assertEqual(caches["shared"].get(key), 2)
+        self.now += LOCK_TIME + BUCKET_TIME + 1
+        self.assertIsNone(caches["shared"].get(key))
+
+    def test_reset_clears_lock_and_failures(self):
+        fail_repeatedly(self.EMAIL, MAX_ATTEMPTS)
+        reset_attempts(self.EMAIL)
+        self.assertTrue(check_throttle(self.EMAIL))
+        fail_repeatedly(self.EMAIL, MAX_ATTEMPTS - 1)
+        self.assertTrue(check_throttle(self.EMAIL))
+
+    def test_lockout_survives_a_full_store(self):
+        shared = dict(settings.CACHES["shared"])
+        if "file" not in shared["BACKEND"].lower():
+            self.skipTest("entry cap only applies to the file-based backend")
+        shared["OPTIONS"] = {**shared.get("OPTIONS", {}), "MAX_ENTRIES": 50}
+        self.use_shared(shared)
+
+        fail_repeatedly(self.EMAIL, MAX_ATTEMPTS)
+        for i in range(300):
+            add_failed_attempt(f"spray{i}@example.com")
+        self.assertFalse(check_throttle(self.EMAIL))
+
+    def test_concurrent_failures_all_count(self):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            self.skipTest("needs fork to share the frozen clock and settings")
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=fail_repeatedly, args=(self.EMAIL, 10)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        key = FAILURES_KEY.format(_ident(self.EMAIL), _bucket(self.now))
+        self.assertEqual(caches["shared"].get(key), 40)
+
+    def test_fails_open_when_store_is_down(self):
+        broken = mock.MagicMock()
+        broken.__getitem__.return_value.get.side_effect = ConnectionError("down")
+        broken.__getitem__.return_value.add.side_effect = ConnectionError("down")
+        with mock.patch.object(throttling, "caches", broken), self.assertLogs("myproject", "ERROR"):
+            add_failed_attempt(self.EMAIL)
+            self.assertTrue(check_throttle(self.EMAIL))
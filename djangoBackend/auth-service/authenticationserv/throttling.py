@@ -1,22 +1,65 @@
-from datetime import datetime
+# authenticationserv/throttling.py
+"""
+Failed-login throttle, kept in the shared cache so every worker sees the same lockouts.
+
+Failures are counted per email in BUCKETS short buckets spanning LOCK_TIME, so "failures in the
+last five minutes" slides along in 30 s steps; once MAX_ATTEMPTS fall inside it a lock key is
+set for LOCK_TIME. Each offender costs at most BUCKETS + 1 small keys, each with its own expiry.
+
+This is only sound on a store whose incr is atomic and keeps the key's expiry, and which never
+evicts live keys (an evicted lock key is a lifted lockout): the default
+portal_common.filecache.SharedFileCache and Redis without an eviction policy. Django's plain
+FileBasedCache and Memcached are neither.
+"""
+import hashlib
+import logging
+import time
+from django.core.cache import caches
+
+logger = logging.getLogger("myproject")
 
-failed_logins = {}   # {email: {count, last_attempt}}
 MAX_ATTEMPTS = 3
 LOCK_TIME = 5 * 60   # seconds
+BUCKETS = 10
+BUCKET_TIME = LOCK_TIME // BUCKETS
+
+FAILURES_KEY = "login-failures:{}:{}"
+LOCK_KEY = "login-lock:{}"
+
+
+def _ident(email):
+    return hashlib.sha1(email.strip().lower().encode()).hexdigest()
+
+def _bucket(now):
+    return int(now // BUCKET_TIME)
 
 def check_throttle(email):
-    record = failed_logins.get(email, {"count": 0, "last_attempt": None})
-    if record["count"] >= MAX_ATTEMPTS:
-        if (datetime.now().timestamp() - record["last_attempt"]) < LOCK_TIME:
-            return False
-    return True
+    try:
+        return caches["shared"].get(LOCK_KEY.format(_ident(email))) is None
+    except Exception as e:
+        logger.error(f"Login throttle unavailable: {e}", exc_info=True)
+        return True
 
 def add_failed_attempt(email):
-    record = failed_logins.get(email, {"count": 0, "last_attempt": None})
-    record["count"] += 1
-    record["last_attempt"] = datetime.now().timestamp()
-    failed_logins[email] = record
+    shared = caches["shared"]
+    ident, now = _ident(email), time.time()
+    bucket = _bucket(now)
+    current_key = FAILURES_KEY.format(ident, bucket)
+    try:
+        # add() is a no-op when the key exists, so concurrent first failures both count
+        shared.add(current_key, 0, timeout=LOCK_TIME + BUCKET_TIME)
+        current = shared.incr(current_key)
+        earlier = shared.get_many([FAILURES_KEY.format(ident, b) for b in range(bucket - BUCKETS + 1, bucket)])
+        if current + sum(earlier.values()) >= MAX_ATTEMPTS:
+            shared.set(LOCK_KEY.format(ident), 1, timeout=LOCK_TIME)
+    except Exception as e:
+        logger.error(f"Failed to record failed login: {e}", exc_info=True)
 
 def reset_attempts(email):
-    if email in failed_logins:
-        del failed_logins[email]
+    ident, bucket = _ident(email), _bucket(time.time())
+    try:
+        caches["shared"].delete_many(
+            [LOCK_KEY.format(ident)] + [FAILURES_KEY.format(ident, b) for b in range(bucket - BUCKETS + 1, bucket + 1)]
+        )
+    except Exception as e:
+        logger.error(f"Failed to reset login throttle: {e}", exc_info=True)
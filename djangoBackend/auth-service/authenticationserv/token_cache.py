@@ -0,0 +1,71 @@
+# authenticationserv/token_cache.py
+"""
+Verified-token cache for /me: token -> decoded JWT payload, so the gateway's check before
+every CRUD request skips the JWT decode and the tokens-table lookup.
+
+Entries live TOKEN_CACHE_TTL seconds at most and never past the JWT's own `exp`; at most
+TOKEN_CACHE_SIZE are kept, least recently used out first.
+
+Revoked tokens (logout, or a login replacing the user's tokens) are dropped here at once; other
+processes learn of them from the revoked-jti log the CRUD services verify tokens against
+(portal_common.jwt_auth.denylist, read at most every JWT_DENYLIST_POLL seconds), so a hit is
+refused once its jti shows up there. Hits never touch the database.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from portal_common.jwt_auth import denylist
+
+def digest(token):
+    # Tokens are bearer credentials: keep only their hashes
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, token):
+        """The cached payload, or None on a miss."""
+        now = time.monotonic()
+        key = digest(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= now:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        if denylist.is_revoked(payload["jti"], payload["exp"]):
+            # Revoked by another process
+            with self.lock:
+                self.entries.pop(key, None)
+            return None
+        return payload
+
+    def put(self, token, payload):
+        ttl = min(settings.TOKEN_CACHE_TTL, payload["exp"] - time.time())
+        # Without a jti a revocation elsewhere could not reach the entry
+        if ttl <= 0 or not payload.get("jti"):
+            return
+        key = digest(token)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, payload)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def revoke(self, tokens):
+        """Drops the tokens here; authenticationserv.revocation tells the other processes."""
+        keys = [digest(token) for token in tokens]
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+
+token_cache = TokenCache()
@@ -1,10 +1,21 @@
 import jwt
 import bcrypt
+import uuid
 from datetime import datetime, timedelta
+from cryptography.hazmat.primitives import serialization
 from django.conf import settings
+from django.db.models import CharField, IntegerField, Value
 from authenticationserv.models import Student, Teacher, Admin
 
-JWT_SECRET = settings.SECRET_KEY
+# RS256 when a private key is configured (other services verify with the public key),
+# otherwise HS256 with the Django secret
+if settings.JWT_PRIVATE_KEY:
+    JWT_ALGORITHM = "RS256"
+    JWT_SIGNING_KEY = serialization.load_pem_private_key(settings.JWT_PRIVATE_KEY.encode(), password=None)
+    JWT_VERIFYING_KEY = JWT_SIGNING_KEY.public_key()
+else:
+    JWT_ALGORITHM = "HS256"
+    JWT_SIGNING_KEY = JWT_VERIFYING_KEY = settings.SECRET_KEY
 
 def generate_token(user):
     payload = {
@@ -13,18 +24,43 @@ def generate_token(user):
         "email": user["email"],
         "type": user["type"],
         "exp": datetime.utcnow() + timedelta(hours=1),
+        # Revocation handle for services verifying tokens themselves
+        "jti": uuid.uuid4().hex,
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
+    return jwt.encode(payload, JWT_SIGNING_KEY, algorithm=JWT_ALGORITHM)
+
+def decode_token(token, verify_exp=True):
+    return jwt.decode(token, JWT_VERIFYING_KEY, algorithms=[JWT_ALGORITHM], options={"verify_exp": verify_exp})
+
+# Checked in this order when an email exists under several roles
+ROLES = [
+    (Student, "student"),
+    (Teacher, "teacher"),
+    (Admin, "admin"),
+]
+ROLE_MODELS = {user_type: model for model, user_type in ROLES}
+# What login reads off the user
+LOGIN_FIELDS = ("id", "name", "email", "password", "status")
+
+def resolve_email(email, fields=("id",)):
+    """
+    (user_type, {field: value}) for the role owning this email, or (None, None).
+    One UNION ALL query over the three user tables, each side an indexed email lookup.
+    """
+    queries = [
+        model.objects.filter(email=email)
+        .annotate(role_rank=Value(rank, output_field=IntegerField()), user_type=Value(user_type, output_field=CharField()))
+        .values_list("role_rank", "user_type", *fields)
+        for rank, (model, user_type) in enumerate(ROLES)
+    ]
+    rows = list(queries[0].union(*queries[1:], all=True).order_by("role_rank")[:1])
+    if not rows:
+        return None, None
+    _, user_type, *values = rows[0]
+    return user_type, dict(zip(fields, values))
 
 def find_user_by_email(email):
-    for model, user_type in [
-        (Student, "student"),
-        (Teacher, "teacher"),
-        (Admin, "admin")
-    ]:
-        try:
-            obj = model.objects.get(email=email)
-            return obj, user_type
-        except model.DoesNotExist:
-            continue
-    return None, None
+    user_type, values = resolve_email(email, LOGIN_FIELDS)
+    if user_type is None:
+        return None, None
+    return ROLE_MODELS[user_type](**values), user_type
@@ -1,19 +1,20 @@
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from django.utils import timezone
-import jwt, bcrypt
 from datetime import datetime
 from authenticationserv.models import Token, Student, Teacher, Admin
 from authenticationserv.validation import LoginSchema, RegisterSchema
 from authenticationserv.throttling import check_throttle, add_failed_attempt, reset_attempts
-from authenticationserv.utils import find_user_by_email, generate_token
-from django.conf import settings
+from authenticationserv.utils import find_user_by_email, resolve_email, generate_token, decode_token
+from authenticationserv.revocation import revoke_tokens
+from portal_common.invalidation import bump_table_generation
+from portal_common.hashing import HashingBusy, hash_password, check_password, needs_rehash, rehash_later
+from authenticationserv.token_cache import token_cache
+from django.db import connections
 import logging
 
 logger = logging.getLogger("myproject")
 
-JWT_SECRET = settings.SECRET_KEY
-
 
 @api_view(["POST"])
 def login(request):
@@ -41,14 +42,26 @@ def login(request):
         logger.info("Inactive users cannot login.")
         return Response({"message": "Inactive users cannot login."}, status=407)
 
-    if not bcrypt.checkpw(password.encode(), user.password.encode()):
+    try:
+        matches = check_password(password, user.password)
+    except HashingBusy as e:
+        logger.info(f"Login shed: {e}")
+        return Response({"message": str(e)}, status=503, headers={"Retry-After": "1"})
+    if not matches:
         add_failed_attempt(email)
         logger.info("Invalid password.")
         return Response({"message": "Invalid password."}, status=407)
 
     reset_attempts(email)
 
-    Token.objects.filter(user_id=user.id, user_type=user_type).delete()
+    if needs_rehash(user.password):
+        rehash_later(password, lambda hashed: save_rehash(type(user), user.id, user.password, hashed))
+
+    replaced = list(Token.objects.filter(user_id=user.id, user_type=user_type).values_list("token", flat=True))
+    if replaced:
+        Token.objects.filter(token__in=replaced).delete()
+        token_cache.revoke(replaced)
+        revoke_tokens(replaced)
 
     payload = {
         "id": user.id,
@@ -58,7 +71,7 @@ def login(request):
     }
 
     token = generate_token(payload)
-    decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+    decoded = decode_token(token)
     expiry = datetime.fromtimestamp(decoded["exp"])
 
     Token.objects.create(
@@ -72,6 +85,14 @@ def login(request):
     return Response({"message": "Logged in successfully", "token": token, "user": payload})
 
 
+def save_rehash(model, user_id, old_hash, new_hash):
+    """Stores a re-costed hash, unless the password was changed meanwhile (runs on the hashing pool)."""
+    try:
+        model.objects.filter(pk=user_id, password=old_hash).update(password=new_hash)
+    finally:
+        connections.close_all()
+
+
 @api_view(["POST"])
 def logout(request):
     auth = request.headers.get("Authorization", "")
@@ -81,6 +102,8 @@ def logout(request):
 
     token = auth.split(" ")[1]
     Token.objects.filter(token=token).delete()
+    token_cache.revoke([token])
+    revoke_tokens([token])
 
     logger.info("Logged out successfully")
     return Response({"message": "Logged out successfully"})
@@ -95,12 +118,18 @@ def me(request):
 
     token = auth.split(" ")[1]
 
+    # Verified recently (and not revoked since): no JWT decode, no tokens-table query
+    decoded = token_cache.get(token)
+    if decoded is not None:
+        return Response({"user": decoded})
+
     try:
-        decoded = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+        decoded = decode_token(token)
         if not Token.objects.filter(token=token).exists():
             logger.info("Session expired or invalid")
             return Response({"message": "Session expired or invalid"}, status=401)
 
+        token_cache.put(token, decoded)
         logger.info(f"User: {decoded}")
         return Response({"user": decoded})
     except Exception:
@@ -119,20 +148,21 @@ def register(request):
     email = data["email"]
     password = data["password"]
 
-    exists = (
-        Student.objects.filter(email=email).exists() or
-        Teacher.objects.filter(email=email).exists() or
-        Admin.objects.filter(email=email).exists()
-    )
-
-    if exists:
+    owner, _ = resolve_email(email)
+    if owner:
         logger.info("Email already exists")
         return Response({"error": "Email already exists"}, status=400)
 
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    try:
+        hashed = hash_password(password)
+    except HashingBusy as e:
+        logger.info(f"Register shed: {e}")
+        return Response({"error": str(e)}, status=503, headers={"Retry-After": "1"})
 
     model = {"student": Student, "teacher": Teacher, "admin": Admin}[user_type]
-    model.objects.create(name=name, email=email, password=hashed)
+    created = model.objects.create(name=name, email=email, password=hashed)
+    # Invalidate cached read-service responses (and search index rows) for this table
+    bump_table_generation(user_type, ids=[created.pk])
 
     logger.info("registered successfully")
     return Response({"message": f"{user_type} registered successfully"})
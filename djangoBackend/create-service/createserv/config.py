@@ -1,51 +1,27 @@
 # createserv/config.py
 import json
+import logging
 import httpx # Use httpx for asynchronous HTTP requests
 from asgiref.sync import sync_to_async
 from createserv.exceptions import UniquenessError
+from portal_common.read_service import read_headers, get_data, read_batch, find_user_conflict
 
-# !!! IMPORTANT: SET YOUR READ SERVICE URL HERE !!!
-# In a real setup, this would come from settings.py or environment variables.
-# createserv/config.py
+logger = logging.getLogger("myproject")
 
-# This must be the correct URL, with NO space at the end of the string.
-READ_SERVICE_URL = "http://localhost:4000/read/api/get-data"
-#                                         ^ NO SPACE HERE
+# Read service endpoints live in portal_common/read_service.py
 
 async def check_global_uniqueness(user, token, data):
-    tables = ["student", "teacher", "admin"]
-
+    # A single indexed EXISTS probe across student/teacher/admin on the read service
     async with httpx.AsyncClient(timeout=10.0) as client:
-        for table in tables:
-            try:
-                response = await client.get(
-                    READ_SERVICE_URL,
-                    params={"tableName": table},
-                    headers={
-                        "X-User": json.dumps(user),
-                        "Authorization": token,
-                    },
-                )
-                response.raise_for_status()
-
-                rows = response.json().get("data", [])
-
-                exists = next((
-                    obj for obj in rows
-                    if obj.get("isDeleted") is False and (
-                        (data.get("email") and obj.get("email") == data["email"]) or
-                        (data.get("cnic") and obj.get("cnic") == data["cnic"]) or
-                        (data.get("phone") and obj.get("phone") == data["phone"])
-                    )
-                ), None)
-
-                if exists:
-                    raise UniquenessError(
-                        f"User with same email, CNIC, or phone already exists"
-                    )
-
-            except httpx.HTTPError:
-                raise Exception("Failed to communicate with Read Service during uniqueness check.")
+        try:
+            conflict = await find_user_conflict(client, user, token, data)
+        except httpx.HTTPError:
+            raise Exception("Failed to communicate with Read Service during uniqueness check.")
+
+    if conflict:
+        raise UniquenessError(
+            f"User with same email, CNIC, or phone already exists"
+        )
 
 # --- Pre-processing Functions ---
 
@@ -59,16 +35,7 @@ async def course_pre_process(user, token, data):
     """Preprocess for course: Checks for duplicate course names."""
     async with httpx.AsyncClient(timeout=10.0) as client:
         try:
-            response = await client.get(
-                READ_SERVICE_URL,
-                params={"tableName": "course"},
-                headers={
-                    "X-User": json.dumps(user),
-                    "Authorization": token,
-                },
-            )
-            response.raise_for_status()
-            existing = response.json().get('data', [])
+            existing = await get_data(client, {"tableName": "course"}, read_headers(user, token))
 
             # Check for conflict: same name AND not soft-deleted
             conflict = next((
@@ -99,111 +66,68 @@ async def enrollment_pre_process(user, token, data):
     records = data if isinstance(data, list) else [data]
     # --- New Fix End ---
     
+    # 1. Auto-assign studentId if the user is a student
+    for record in records:
+        if user.get('type') == "student":
+            record['studentId'] = user.get('id')
+
+    records = [r for r in records if r.get('studentId') and r.get('courseId')]
+    if not records:
+        # Should be caught by serializer, but good safety check
+        return []
+
+    student_ids = sorted({r['studentId'] for r in records})
+    course_ids = sorted({r['courseId'] for r in records})
+
+    # 2. Everything the checks need, fetched in one get-batch round trip for all records
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        try:
+            results = await read_batch(client, user, token, [
+                {"key": "requested", "tableName": "course", "filters": {"id": course_ids}, "fields": ["id", "credit_hours"]},
+                {"key": "enrollments", "tableName": "enrollment", "filters": {"studentId": student_ids}, "fields": ["studentId", "courseId"]},
+                # Current credit load per student, summed by the database over enrollment -> course
+                {"key": "credits", "tableName": "enrollment", "filters": {"studentId": student_ids},
+                 "aggregate": "sum:credit_hours", "groupBy": "studentId"},
+            ])
+        except httpx.HTTPError:
+            raise Exception("Failed to communicate with Read Service during enrollment validation.")
+
+    requested = {c["id"]: c for c in results["requested"]}
+    credit_load = {row["studentId"]: int(row["sum_credit_hours"] or 0) for row in results["credits"]}
+
+    enrolled = {}  # studentId -> set of courseIds, updated as records are accepted
+    for e in results["enrollments"]:
+        enrolled.setdefault(e["studentId"], set()).add(e["courseId"])
+
     # The final list of records ready for insertion
     final_records = []
-    
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        # Iterate over the list of individual enrollment records
-        for record in records:
-            
-            # 1. Auto-assign studentId if the user is a student
-            if user.get('type') == "student":
-                record['studentId'] = user.get('id')
-            
-            student_id = record.get('studentId')
-            course_id = record.get('courseId')
-
-            if not student_id or not course_id:
-                # Should be caught by serializer, but good safety check
-                continue 
-
-            try:
-                print("user: ", user)
-                print("token: ", token)
-                # 2. Validate course existence
-                course_response = await client.get(
-                    READ_SERVICE_URL,
-                    params={"tableName": "course", "id": course_id},
-                    headers={"X-User": json.dumps(user), "Authorization": token},
-                )
-                print("course response: ", course_response)
-                print("course_response.json()", course_response.json())
-                course_response.raise_for_status()
-                courses = course_response.json().get('data', [])
-                
-                if not courses:
-                    raise Exception(f"Invalid courseId {course_id} — course does not exist")
-
-                # 3. Check for duplicate enrollment
-                enrollment_response = await client.get(
-                    READ_SERVICE_URL,
-                    params={"tableName": "enrollment"},
-                    headers={"X-User": json.dumps(user), "Authorization": token},
-                )
-                enrollment_response.raise_for_status()
-                existing_enrollments = enrollment_response.json().get('data', [])
-                
-                already_enrolled = next((
-                    e for e in existing_enrollments 
-                    if e.get('studentId') == student_id and e.get('courseId') == course_id
-                ), None)
-
-                if already_enrolled:
-                    print(f"Skipping duplicate enrollment: courseId {course_id}")
-                    continue
-
-                courses_response = await client.get(
-                    READ_SERVICE_URL,
-                    params={"tableName": "course"},
-                    headers={"X-User": json.dumps(user), "Authorization": token},
-                )
-                courses_response.raise_for_status()
-                allCourses = courses_response.json().get('data', [])
-
-                enrolled_course_ids = [
-                    e.get("courseId")
-                    for e in existing_enrollments
-                    if e.get("studentId") == student_id
-                ]
-
-                enrolled_courses = []
-
-                for course in allCourses:
-                    if course.get("id") in enrolled_course_ids:
-                        enrollment = next(
-                            (
-                                e for e in existing_enrollments
-                                if e.get("studentId") == student_id
-                                and e.get("courseId") == course.get("id")
-                            ),
-                            None,
-                        )
-
-                        enrolled_courses.append({
-                            **course,
-                            "enrollmentId": enrollment.get("id") if enrollment else None,
-                        })
-                
-                total_credit_hours = sum(
-                    int(course.get("credit_hours") or 0)
-                    for course in enrolled_courses
-                )
-
-                current_course = courses[0]
-                current_course_credits = int(current_course.get("credit_hours") or 0)
-
-                if total_credit_hours + current_course_credits > 15:
-                    print("Max credit hours exceeded.")
-                    continue
-
-
-                # Append the processed record to the final list
-                final_records.append({"studentId": student_id, "courseId": course_id})
-                
-            except httpx.HTTPError:
-                raise Exception("Failed to communicate with Read Service during enrollment validation.")
-            except Exception as e:
-                raise Exception(e.args[0] if e.args else "Failed to validate courses")
+
+    for record in records:
+        student_id = record['studentId']
+        course_id = record['courseId']
+
+        # 3. Validate course existence
+        if course_id not in requested:
+            raise Exception(f"Invalid courseId {course_id} — course does not exist")
+
+        # 4. Check for duplicate enrollment
+        student_courses = enrolled.setdefault(student_id, set())
+        if course_id in student_courses:
+            logger.info(f"Skipping duplicate enrollment: student {student_id}, course {course_id}")
+            continue
+
+        # 5. Credit hour cap (includes records accepted earlier in this request)
+        total_credit_hours = credit_load.get(student_id, 0)
+        current_course_credits = int(requested[course_id].get("credit_hours") or 0)
+
+        if total_credit_hours + current_course_credits > 15:
+            logger.warning(f"Skipping enrollment of student {student_id} in course {course_id}: max credit hours exceeded")
+            continue
+
+        student_courses.add(course_id)
+        credit_load[student_id] = total_credit_hours + current_course_credits
+        # Append the processed record to the final list
+        final_records.append({"studentId": student_id, "courseId": course_id})
 
     return final_records
 
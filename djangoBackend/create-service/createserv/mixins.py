@@ -2,8 +2,9 @@
 import json
 import logging
 from django.apps import apps
-import bcrypt
 from asgiref.sync import sync_to_async
+from portal_common.renderers import loads
+from portal_common.hashing import hash_passwords
 
 logger = logging.getLogger("myproject")
 
@@ -16,7 +17,7 @@ class HeaderUserMixin:
         if not user_header:
             return None
         try:
-            return json.loads(user_header)
+            return loads(user_header)
         except json.JSONDecodeError:
             logger.error("Failed to decode X-User header", exc_info=True)
             return None
@@ -89,18 +90,19 @@ class InsertMixin:
 
         def sync_insert(records):
             local_inserted = []
-            for record in records:
-                if not isinstance(record, dict):
-                    continue
-                allowed_data = {k: v for k, v in record.items() if k in table_config['fields']}
-                if not allowed_data:
-                    continue
-
-                if 'password' in allowed_data:
-                    raw_password = allowed_data['password'].encode('utf-8')
-                    salt = bcrypt.gensalt(rounds=10)
-                    allowed_data['password'] = bcrypt.hashpw(raw_password, salt).decode('utf-8')
-
+            rows = [
+                {k: v for k, v in record.items() if k in table_config['fields']}
+                for record in records if isinstance(record, dict)
+            ]
+            rows = [row for row in rows if row]
+
+            # All of the batch's passwords at once, spread over the hashing pool
+            with_password = [row for row in rows if 'password' in row]
+            hashed = hash_passwords([row['password'] for row in with_password])
+            for row, password in zip(with_password, hashed):
+                row['password'] = password
+
+            for allowed_data in rows:
                 final_data = {}
                 for key, value in allowed_data.items():
                     if key.endswith('Id'):
@@ -113,8 +115,8 @@ class InsertMixin:
                     else:
                         final_data[key] = value
 
-                model_class.objects.create(**final_data)
-                local_inserted.append(allowed_data)
+                obj = model_class.objects.create(**final_data)
+                local_inserted.append({**allowed_data, 'id': obj.pk})
             return local_inserted
 
         return await sync_to_async(sync_insert)(records_to_insert)
@@ -1,8 +1,29 @@
 # throttles.py
 import json
 from rest_framework.throttling import SimpleRateThrottle
+from portal_common.renderers import loads
+from portal_common.ratelimit import rate_limiter
 
-class XUserRateThrottle(SimpleRateThrottle):
+class GCRARateThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle's rates, scopes and cache keys, counted by portal_common/ratelimit.py
+    (one number per key, updated atomically) instead of a cached list of timestamps.
+    """
+    retry_after = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self.retry_after = rate_limiter().hit(self.key, self.duration / self.num_requests, self.duration)
+        return allowed or self.throttle_failure()
+
+    def wait(self):
+        return self.retry_after
+
+class XUserRateThrottle(GCRARateThrottle):
     scope = "xuser"
 
     def get_cache_key(self, request, view):
@@ -14,7 +35,7 @@ class XUserRateThrottle(SimpleRateThrottle):
             return None  # fallback to anon throttle or no throttle
 
         try:
-            user_data = json.loads(user_header)
+            user_data = loads(user_header)
         except json.JSONDecodeError:
             return None
 
@@ -10,6 +10,8 @@ from .serializers import CreateInputSerializer, DATA_SERIALIZER_MAPPING
 from .mixins import HeaderUserMixin, RBACMixin, ValidationMixin, InsertMixin
 from .throttles import XUserRateThrottle
 from createserv.exceptions import UniquenessError
+from portal_common.invalidation import bump_table_generation, record_user_write, LAST_WRITE_HEADER
+from portal_common.hashing import HashingBusy
 
 logger = logging.getLogger("myproject")
 
@@ -61,6 +63,9 @@ class GenericCreateView(
                     {"error": str(e)},
                     status=409,
                 )
+            except HashingBusy as e:
+                logger.info(f"Insert shed: {e}")
+                return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"})
             except Exception as e:
                 logger.error(f"Insertion failed: {e}", exc_info=True)
                 return Response({"error": f"Database insertion failed: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
@@ -68,8 +73,14 @@ class GenericCreateView(
             if not inserted:
                 return Response({"error": "Failed to insert record(s)"}, status=status.HTTP_400_BAD_REQUEST)
 
+            # Invalidate cached read-service responses for this table
+            bump_table_generation(table, ids=[record['id'] for record in inserted])
+
             message = f"{len(inserted)} {table} records inserted successfully" if len(inserted) > 1 else f"{table} record inserted successfully"
             logger.info(message)
-            return Response({"message": message}, status=status.HTTP_201_CREATED)
+            response = Response({"message": message}, status=status.HTTP_201_CREATED)
+            # Lets the caller's next reads skip replicas that may not have this row yet
+            response[LAST_WRITE_HEADER] = str(record_user_write(user))
+            return response
 
         return async_to_sync(async_post_logic)()
@@ -1,24 +1,16 @@
-import json
 import httpx
-from django.conf import settings
 
-# This must be the correct URL, with NO space at the end of the string.
-READ_SERVICE_URL = "http://localhost:4000/read/api/get-data" 
-#                                         ^ NO SPACE HERE
+from portal_common.read_service import get_data, get_exists, read_headers
 
 
 async def fetch(table, params, token, user):
     async with httpx.AsyncClient() as client:
-        res = await client.get(
-            READ_SERVICE_URL,
-            params={"tableName": table, **params},
-            headers={
-                "Authorization": token,
-                "x-user": json.dumps(user)
-            }
-        )
-        data = res.json()
-        return data.get("data", [])
+        return await get_data(client, {"tableName": table, **params}, read_headers(user, token))
+
+
+async def exists(table, params, token, user):
+    async with httpx.AsyncClient() as client:
+        return await get_exists(client, {"tableName": table, **params}, read_headers(user, token))
 
 
 # ============================
@@ -28,14 +20,14 @@ async def before_delete_teacher(token, user, ids):
     if user["type"] != "admin":
         return False, "Only admin can delete teachers"
 
-    courses = await fetch(
+    active_courses = await exists(
         "course",
-        {"teacherId": ",".join(map(str, ids))},
+        {"teacherId": ",".join(map(str, ids)), "isDeleted": "false"},
         token,
         user
     )
 
-    if any(not c["isDeleted"] for c in courses):
+    if active_courses:
         return False, "Cannot delete teacher with active courses"
 
     return True, None
@@ -45,14 +37,14 @@ async def before_delete_student(token, user, ids):
     if user["type"] != "admin":
         return False, "Only admin can delete students"
 
-    rows = await fetch(
+    enrolled = await exists(
         "enrollment",
         {"studentId": ",".join(map(str, ids))},
         token,
         user
     )
 
-    if rows:
+    if enrolled:
         return False, "Cannot delete student with active enrollments"
 
     return True, None
@@ -62,14 +54,14 @@ async def before_delete_course(token, user, ids):
     if user["type"] not in ("admin", "teacher"):
         return False, "Only admins or teachers can delete courses"
 
-    rows = await fetch(
+    enrolled = await exists(
         "enrollment",
         {"courseId": ",".join(map(str, ids))},
         token,
         user
     )
 
-    if rows:
+    if enrolled:
         return False, "Cannot delete course with enrolled students"
 
     return True, None
@@ -92,9 +84,10 @@ async def before_delete_enrollment(token, user, ids):
 
     # TEACHER
     if user["type"] == "teacher":
+        # expand=course brings each enrollment's course along in the same read
         enrollments = await fetch(
             "enrollment",
-            {"id": ",".join(map(str, ids))},
+            {"id": ",".join(map(str, ids)), "expand": "course"},
             token,
             user
         )
@@ -102,18 +95,7 @@ async def before_delete_enrollment(token, user, ids):
         if not enrollments:
             return False, "No enrollments found"
 
-        course_ids = list({e["courseId"] for e in enrollments})
-
-        courses = await fetch(
-            "course",
-            {"id": ",".join(map(str, course_ids))},
-            token,
-            user
-        )
-
-        owned_course_ids = [c["id"] for c in courses if c["teacherId"] == user["id"]]
-
-        if any(e["courseId"] not in owned_course_ids for e in enrollments):
+        if any(not e["course"] or e["course"]["teacherId"] != user["id"] for e in enrollments):
             return False, "Teachers can only delete enrollments in their own courses"
 
     return True, None
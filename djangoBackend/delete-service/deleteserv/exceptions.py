@@ -0,0 +1,5 @@
+# deleteserv/exceptions.py
+
+class ReadServiceError(Exception):
+    # An access check could not get an answer from the read service; answered with 502
+    pass
@@ -1,6 +1,7 @@
 # deleteserv/middleware.py
 import json
 from rest_framework.response import Response
+from portal_common.renderers import loads
 
 class AttachUserMiddleware:
     """
@@ -20,7 +21,7 @@ class AttachUserMiddleware:
         header = request.headers.get("x-user")
         if header:
             try:
-                request.user_data = json.loads(header)
+                request.user_data = loads(header)
             except json.JSONDecodeError:
                 return Response({"error": "Invalid user header"}, status=400)
         else:
@@ -32,7 +33,7 @@ class AttachUserMiddleware:
         header = request.headers.get("x-user")
         if header:
             try:
-                request.user_data = json.loads(header)
+                request.user_data = loads(header)
             except json.JSONDecodeError:
                 return Response({"error": "Invalid user header"}, status=400)
         else:
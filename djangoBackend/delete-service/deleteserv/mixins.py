@@ -1,7 +1,10 @@
+import httpx
 from asgiref.sync import async_to_sync
 from deleteserv.models import Admin, Teacher, Student, Course, Enrollment
 from deleteserv.validation import validate_delete_payload
 from deleteserv.access import access_rules
+from deleteserv.exceptions import ReadServiceError
+from portal_common.invalidation import bump_table_generation
 
 MODEL_MAP = {
     "student": Student,
@@ -29,6 +32,9 @@ class AuthorizationMixin:
         before_hook = access_rules[type_]["before"]
         try:
             allowed, msg = async_to_sync(before_hook)(token, user, id_list)
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            # Error status, unreachable, or a body without the expected answer
+            raise ReadServiceError(f"Failed to communicate with Read Service during access check: {e}")
         except Exception as e:
             raise PermissionError(f"Authorization hook failed: {e}")
         if not allowed:
@@ -46,7 +52,6 @@ class DeletionMixin:
         if type_ == "enrollment":
             # HARD DELETE
             deleted_count, _ = model.objects.filter(id__in=id_list).delete()
-            return deleted_count
         else:
             # SOFT DELETE
             objs = model.objects.filter(id__in=id_list)
@@ -55,4 +60,8 @@ class DeletionMixin:
                 if hasattr(obj, "status"):
                     obj.status = "inactive"
                 obj.save()
-            return objs.count()
+            deleted_count = objs.count()
+
+        # Invalidate cached read-service responses for this table
+        bump_table_generation(type_, ids=id_list)
+        return deleted_count
@@ -3,8 +3,10 @@ from rest_framework.response import Response
 from rest_framework import status
 import logging
 
+from deleteserv.exceptions import ReadServiceError
 from deleteserv.mixins import PayloadValidationMixin, AuthorizationMixin, DeletionMixin
 from .throttles import XUserRateThrottle
+from portal_common.invalidation import record_user_write, LAST_WRITE_HEADER
 
 logger = logging.getLogger("myproject")  # Custom logger
 
@@ -49,6 +51,9 @@ class DeleteDataAPIView(PayloadValidationMixin, AuthorizationMixin, DeletionMixi
         except PermissionError as e:
             logger.info(f"Delete denied for {type_} IDs {id_list} by user {user_id}: {e}")
             return Response({"error": str(e)}, status=status.HTTP_403_FORBIDDEN)
+        except ReadServiceError as e:
+            logger.error(f"Delete check for {type_} IDs {id_list} by user {user_id} failed: {e}")
+            return Response({"error": "Could not verify the delete, try again shortly"}, status=status.HTTP_502_BAD_GATEWAY)
 
         # Perform deletion
         try:
@@ -58,4 +63,7 @@ class DeleteDataAPIView(PayloadValidationMixin, AuthorizationMixin, DeletionMixi
             logger.error(f"Deletion failed for {type_} IDs {id_list} by user {user_id}: {e}", exc_info=True)
             return Response({"error": "Deletion failed"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return Response({"message": f"{type_}(s) deleted successfully"}, status=status.HTTP_200_OK)
+        response = Response({"message": f"{type_}(s) deleted successfully"}, status=status.HTTP_200_OK)
+        # Lets the caller's next reads skip replicas that may not have this change yet
+        response[LAST_WRITE_HEADER] = str(record_user_write(user))
+        return response
@@ -0,0 +1,4 @@
+"""
+Code shared by the Django services. Each service puts djangoBackend/ on sys.path from its
+settings module, so these modules import as portal_common.<name> in every service.
+"""
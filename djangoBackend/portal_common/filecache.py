@@ -0,0 +1,94 @@
+# portal_common/filecache.py
+"""
+Default backend of the "shared" cache: Django's FileBasedCache, made safe for the counters,
+lockouts and revocations the services keep in it.
+
+- add() and incr()/decr() read-modify-write under an exclusive lock on <LOCATION>/.lock, so
+  concurrent workers (of any service) never lose an update. incr keeps the key's expiry;
+  FileBasedCache's is a get + set that re-stores the key with the default timeout.
+- Culling only removes expired entries, never live ones: a lockout, a revoked-jti entry or a
+  generation counter stays until it expires or is deleted. Past MAX_ENTRIES files (default
+  10000) a set sweeps out expired ones, at most once every SWEEP_INTERVAL seconds.
+
+Redis gives the same guarantees across hosts when run without an eviction policy
+(maxmemory-policy noeviction).
+"""
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+from django.core.files.move import file_move_safe
+
+
+class SharedFileCache(FileBasedCache):
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, dir, params):
+        options = {"MAX_ENTRIES": 10000, **params.get("OPTIONS", {})}
+        super().__init__(dir, {**params, "OPTIONS": options})
+        # The file lock excludes other processes only; threads of this one queue here first
+        self._thread_lock = threading.Lock()
+        self._swept_at = None
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            self._createdir()
+            with open(os.path.join(self._dir, ".lock"), "ab") as f:
+                locks.lock(f, locks.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    locks.unlock(f)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        fname = self._key_to_file(key, version)
+        with self._locked():
+            try:
+                with open(fname, "rb") as f:
+                    expiry = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except (FileNotFoundError, EOFError):
+                raise ValueError(f"Key '{key}' not found")
+            if expiry is not None and expiry < time.time():
+                self._delete(fname)
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+            renamed = False
+            try:
+                with open(fd, "wb") as f:
+                    f.write(pickle.dumps(expiry, self.pickle_protocol))
+                    f.write(zlib.compress(pickle.dumps(value, self.pickle_protocol)))
+                file_move_safe(tmp_path, fname, allow_overwrite=True)
+                renamed = True
+            finally:
+                if not renamed:
+                    os.remove(tmp_path)
+        return value
+
+    def _cull(self):
+        """Removes expired entries once there are MAX_ENTRIES; live ones are never evicted."""
+        now = time.monotonic()
+        if self._swept_at is not None and now - self._swept_at < self.SWEEP_INTERVAL:
+            return
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+        self._swept_at = now
+        for fname in filelist:
+            try:
+                with open(fname, "rb") as f:
+                    self._is_expired(f)  # deletes the file when it is
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,198 @@
+# portal_common/hashing.py
+"""
+Password hashing off the request path: bcrypt calls run on a pool of HASH_POOL_WORKERS
+threads (default: one per core). bcrypt releases the GIL while hashing, so the threads use
+every core, and the async API keeps the event loop free meanwhile.
+
+At most HASH_POOL_WORKERS + HASH_POOL_QUEUE hashes are running or waiting at once. A request
+arriving when that is full gets HashingBusy (answered 503) instead of queueing behind a burst;
+once admitted, a bulk insert waits for slots rather than failing halfway through.
+
+The cost factor is not hard-coded: the first process to need it times a cheap hash, picks the
+highest rounds whose hash fits BCRYPT_TARGET_MS on this host (BCRYPT_MIN_ROUNDS..
+BCRYPT_MAX_ROUNDS) and publishes it in the shared cache for good, so every service hashes at
+the same cost; processes re-read it every ROUNDS_RECHECK seconds, so deleting the key (to
+recalibrate) reaches all of them. BCRYPT_ROUNDS pins the cost instead. Every hash records its
+own cost: weaker ones are replaced after a successful login (needs_rehash), stronger ones only
+when BCRYPT_ROUNDS pins a lower cost, never because of a calibration (which a loaded host can
+skew low).
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from django.conf import settings
+from django.core.cache import caches
+
+from portal_common.timing import timed
+
+logger = logging.getLogger("myproject")
+
+# Rounds timed to estimate the cost of the real ones (each extra round doubles the work)
+CALIBRATION_ROUNDS = 6
+ROUNDS_KEY = "bcrypt-rounds"
+ROUNDS_RECHECK = 300
+
+
+class HashingBusy(Exception):
+    # Password hashing pool saturated; answered with 503
+    pass
+
+
+class HashPool:
+    def __init__(self):
+        self.executor = None
+        self.slots = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.executor is None:
+                workers = getattr(settings, "HASH_POOL_WORKERS", None) or os.cpu_count() or 1
+                queue = getattr(settings, "HASH_POOL_QUEUE", 64)
+                self.slots = threading.BoundedSemaphore(workers + queue)
+                self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash-pool")
+
+    def submit(self, fn, *args, wait=False):
+        """A future for fn(*args); HashingBusy when the queue is full, unless wait=True."""
+        if self.executor is None:
+            self.start()
+        if not self.slots.acquire(blocking=wait):
+            raise HashingBusy("Server busy, try again shortly")
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+
+hash_pool = HashPool()
+
+
+# --- Cost policy ---
+
+_rounds = None
+_rounds_checked_at = None
+# Guards the two above; first use waits for one calibration instead of each thread running its own
+_rounds_lock = threading.Lock()
+
+
+def calibrate():
+    """The highest rounds whose hash fits BCRYPT_TARGET_MS here, within the configured bounds."""
+    low, high = getattr(settings, "BCRYPT_MIN_ROUNDS", 10), getattr(settings, "BCRYPT_MAX_ROUNDS", 14)
+    samples = []
+    for _ in range(3):
+        started = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=CALIBRATION_ROUNDS))
+        samples.append(time.perf_counter() - started)
+    unit_seconds = min(samples) / 2 ** CALIBRATION_ROUNDS
+    budget = getattr(settings, "BCRYPT_TARGET_MS", 100) / 1000
+    rounds = low
+    while rounds < high and unit_seconds * 2 ** (rounds + 1) <= budget:
+        rounds += 1
+    logger.info(f"bcrypt cost {rounds} (~{unit_seconds * 2 ** rounds * 1000:.0f} ms per hash, budget {budget * 1000:.0f} ms)")
+    return rounds
+
+
+def cost_rounds():
+    global _rounds, _rounds_checked_at
+    pinned = getattr(settings, "BCRYPT_ROUNDS", None)
+    if pinned:
+        return pinned
+    now = time.monotonic()
+    with _rounds_lock:
+        if _rounds is None or now - _rounds_checked_at >= ROUNDS_RECHECK:
+            _rounds, _rounds_checked_at = shared_rounds(_rounds), now
+        return _rounds
+
+
+def shared_rounds(current=None):
+    """The cost published in the shared cache; calibrated and published first if there is none."""
+    shared = caches["shared"]
+    try:
+        rounds = shared.get(ROUNDS_KEY)
+        if rounds is None:
+            # First calibration published wins, so concurrent starters agree; it never expires,
+            # so no later calibration replaces it
+            shared.add(ROUNDS_KEY, calibrate(), timeout=None)
+            rounds = shared.get(ROUNDS_KEY)
+    except Exception as e:
+        logger.error(f"Failed to share bcrypt cost: {e}", exc_info=True)
+        rounds = None
+    return rounds or current or calibrate()
+
+
+def hash_rounds(hashed):
+    """The cost a hash was made with ("$2b$12$..." -> 12), None if it isn't a bcrypt hash."""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed):
+    rounds, target = hash_rounds(hashed), cost_rounds()
+    if rounds is None or rounds < target:
+        return True
+    # Lowering the cost of existing hashes takes a deliberate BCRYPT_ROUNDS
+    return rounds > target and bool(getattr(settings, "BCRYPT_ROUNDS", None))
+
+
+def _hash(password):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=cost_rounds())).decode("utf-8")
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+# --- Sync API (request threads) ---
+
+def hash_password(password):
+    with timed("bcrypt"):
+        return hash_pool.submit(_hash, password).result()
+
+
+def check_password(password, hashed):
+    with timed("bcrypt"):
+        return hash_pool.submit(_check, password, hashed).result()
+
+
+def hash_passwords(passwords):
+    """Hashes in parallel; only the first is subject to shedding, the rest wait for a slot."""
+    with timed("bcrypt"):
+        futures = [hash_pool.submit(_hash, p, wait=i > 0) for i, p in enumerate(passwords)]
+        return [f.result() for f in futures]
+
+
+def rehash_later(password, save):
+    """
+    Hashes password at the current cost in the background and passes the result to save.
+    Skipped (until the next login) when the pool has no room.
+    """
+    def run():
+        try:
+            save(_hash(password))
+        except Exception as e:
+            logger.error(f"Background rehash failed: {e}", exc_info=True)
+    try:
+        hash_pool.submit(run)
+    except HashingBusy:
+        pass
+
+
+# --- Async API (event loop) ---
+
+async def ahash_password(password):
+    with timed("bcrypt"):
+        return await asyncio.wrap_future(hash_pool.submit(_hash, password))
+
+
+async def acheck_password(password, hashed):
+    with timed("bcrypt"):
+        return await asyncio.wrap_future(hash_pool.submit(_check, password, hashed))
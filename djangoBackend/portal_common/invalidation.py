@@ -0,0 +1,58 @@
+# portal_common/invalidation.py
+import logging
+import time
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger("myproject")
+
+# The read service keys cached responses on this counter (readserv/cache.py)
+GENERATION_KEY = "table-generation:{}"
+# Ids touched by each generation, so the read service's search index (readserv/search.py)
+# re-reads only those rows instead of the whole table
+CHANGES_KEY = "table-changes:{}:{}"
+CHANGES_TIMEOUT = 3600
+CHANGES_ATTEMPTS = 3
+
+
+def bump_table_generation(table, ids=None):
+    """Moves the table's generation on so every cached read-service response for it goes stale."""
+    shared = caches['shared']
+    key = GENERATION_KEY.format(table)
+    try:
+        generation = shared.incr(key)
+        # A backend whose incr isn't atomic can hand two writers one generation. add() never
+        # overwrites another writer's ids, so the later writer moves on to the next one.
+        for _ in range(CHANGES_ATTEMPTS):
+            if not ids or shared.add(CHANGES_KEY.format(table, generation), list(ids), timeout=CHANGES_TIMEOUT):
+                break
+            generation = shared.incr(key)
+        else:
+            logger.error(f"Could not record changed ids for '{table}'; its search index will rebuild")
+    except ValueError:
+        # Never seeded (or flushed): start from the clock, not 0, so old keys can't match again
+        shared.add(key, time.time_ns())
+    except Exception as e:
+        logger.error(f"Failed to bump cache generation for '{table}': {e}", exc_info=True)
+
+
+LAST_WRITE_HEADER = "X-Last-Write"
+LAST_WRITE_KEY = "last-write:{}:{}"
+
+
+def record_user_write(user):
+    """
+    Marks that this caller just wrote. Returns the timestamp (ms) for the X-Last-Write
+    response header; the read service keeps the caller's reads on the primary database
+    until replicas have had READ_REPLICA_PIN_SECONDS to catch up.
+    """
+    written_at = int(time.time() * 1000)
+    try:
+        caches['shared'].set(
+            LAST_WRITE_KEY.format(user.get('type'), user.get('id')),
+            written_at,
+            timeout=getattr(settings, 'READ_REPLICA_PIN_SECONDS', 5),
+        )
+    except Exception as e:
+        logger.error(f"Failed to record last write for user {user.get('id')}: {e}", exc_info=True)
+    return written_at
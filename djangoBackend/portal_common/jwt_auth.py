@@ -0,0 +1,167 @@
+# portal_common/jwt_auth.py
+"""
+Local bearer-token verification, so requests don't need the gateway's /me round trip to the
+auth service first.
+
+The auth service signs tokens with its RS256 private key (JWT_PRIVATE_KEY there); each CRUD
+service checks them against JWT_PUBLIC_KEY: signature, expiry, and that the token's `jti` was
+not revoked. When JWT_PUBLIC_KEY is unset the middleware does nothing and the X-User header
+set by the gateway is trusted as before.
+
+Revocations (logout, a login replacing the user's tokens) are appended by the auth service to
+a log in the shared cache, split by token expiry into REVOKED_WINDOW-second windows, each
+numbered from 1. Checking a token reads only its own window, and only the entries added since
+the last look, at most every JWT_DENYLIST_POLL seconds, so a revoked token is accepted
+elsewhere for that long at most.
+
+A window is kept until all of its tokens have expired, so an entry missing from one that is
+still in use was lost (evicted, flushed), not expired. Once it has been missing for
+ENTRY_WRITE_GRACE and a full reload of the window doesn't find it, every token expiring in that
+window is rejected: better to make those users sign in again than to accept a revoked token.
+"""
+import json
+import logging
+import threading
+import time
+import jwt
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger("myproject")
+
+# Written by authenticationserv/revocation.py
+REVOKED_WINDOW = 600
+REVOKED_COUNT_KEY = "revoked-jti:{}:count"
+REVOKED_ENTRY_KEY = "revoked-jti:{}:{}"
+# A missing entry below the count may still be being written; after this long (seconds) it is
+# an unknown revocation
+ENTRY_WRITE_GRACE = 5
+# Claims forwarded as X-User, the shape the gateway used to take from /me
+USER_CLAIMS = ("id", "name", "email", "type")
+
+
+class RevocationWindow:
+    """What this process knows of one window of the log."""
+    def __init__(self):
+        self.revoked = set()
+        self.seen = 0
+        self.gap_since = None
+        self.checked_at = None
+        self.closed = False
+
+
+class Denylist:
+    def __init__(self):
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def is_revoked(self, jti, exp):
+        number = int(exp // REVOKED_WINDOW)
+        window = self.windows.get(number)
+        now = time.monotonic()
+        if window is None or now - window.checked_at >= settings.JWT_DENYLIST_POLL:
+            window = self.refresh(number, now)
+        return window.closed or jti in window.revoked
+
+    def refresh(self, number, now):
+        with self.lock:
+            window = self.windows.get(number)
+            if window is not None and now - window.checked_at < settings.JWT_DENYLIST_POLL:
+                return window
+            if window is None:
+                window = self.windows[number] = RevocationWindow()
+            window.checked_at = now
+            if not window.closed:
+                try:
+                    self.read(number, window, now)
+                except Exception as e:
+                    logger.error(f"Failed to refresh revoked token list: {e}", exc_info=True)
+
+            # Every token of an earlier window has expired
+            current = int(time.time() // REVOKED_WINDOW)
+            for old in [n for n in self.windows if n < current]:
+                del self.windows[old]
+            return window
+
+    def read(self, number, window, now):
+        shared = caches["shared"]
+        count = shared.get(REVOKED_COUNT_KEY.format(number)) or 0
+        if count < window.seen:
+            return self.close(number, window, "its count went back")
+        if count == window.seen:
+            return
+        entries = self.fetch(number, range(window.seen + 1, count + 1))
+        missing = [n for n in range(window.seen + 1, count + 1) if n not in entries]
+        if missing and window.gap_since is not None and now - window.gap_since >= ENTRY_WRITE_GRACE:
+            entries = self.fetch(number, range(1, count + 1))
+            missing = [n for n in range(1, count + 1) if n not in entries]
+            if missing:
+                return self.close(number, window, f"entry {missing[0]} is gone")
+
+        window.revoked.update(jti for jti, exp in entries.values())
+        if missing:
+            # Look again from the gap next time, in case it is an entry still being written
+            window.seen = missing[0] - 1
+            window.gap_since = window.gap_since or now
+        else:
+            window.seen, window.gap_since = count, None
+
+    def fetch(self, number, entry_numbers):
+        keys = {REVOKED_ENTRY_KEY.format(number, n): n for n in entry_numbers}
+        return {keys[key]: entry for key, entry in caches["shared"].get_many(list(keys)).items()}
+
+    def close(self, number, window, reason):
+        logger.error(f"Revocation log window {number} is incomplete ({reason}); rejecting every token expiring in it")
+        window.closed = True
+
+
+denylist = Denylist()
+
+
+def verify_token(token):
+    """The token's claims; raises jwt.InvalidTokenError if it is forged, expired or revoked."""
+    claims = jwt.decode(token, settings.JWT_PUBLIC_KEY, algorithms=["RS256"], options={"require": ["exp", "jti"]})
+    if denylist.is_revoked(claims["jti"], claims["exp"]):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return claims
+
+
+def authenticate(request):
+    """None once X-User holds the verified claims, else the 401 to send back."""
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    if not auth.startswith("Bearer "):
+        return JsonResponse({"error": "Not authenticated"}, status=401)
+    try:
+        claims = verify_token(auth.split(" ")[1])
+    except jwt.InvalidTokenError as e:
+        logger.info(f"Rejected bearer token: {e}")
+        return JsonResponse({"error": "Invalid or expired token"}, status=401)
+
+    # Whatever X-User the caller sent is replaced by what the token says
+    request.META["HTTP_X_USER"] = json.dumps({k: claims.get(k) for k in USER_CLAIMS})
+    request.__dict__.pop("headers", None)
+    return None
+
+
+@sync_and_async_middleware
+def JWTAuthMiddleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if settings.JWT_PUBLIC_KEY:
+                # The denylist refresh reads the shared cache: keep it off the event loop
+                rejected = await sync_to_async(authenticate, thread_sensitive=False)(request)
+                if rejected is not None:
+                    return rejected
+            return await get_response(request)
+    else:
+        def middleware(request):
+            if settings.JWT_PUBLIC_KEY:
+                rejected = authenticate(request)
+                if rejected is not None:
+                    return rejected
+            return get_response(request)
+
+    return middleware
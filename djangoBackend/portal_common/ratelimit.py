@@ -0,0 +1,171 @@
+# portal_common/ratelimit.py
+"""
+GCRA rate limiting (the "virtual scheduling" form of a token bucket) behind throttles.py.
+
+A limit of N requests per period P lets a request through every P/N seconds, with bursts of
+up to N. Per key only one number is stored, the theoretical arrival time (TAT): a request is
+allowed unless TAT is more than P - P/N ahead of now, and moves TAT on by P/N. That is O(1)
+memory and CPU per key, where SimpleRateThrottle rewrites a list of N timestamps on every
+request.
+
+Backends (RATE_LIMIT_BACKEND):
+    local   in-process dict; every worker counts on its own
+    shm     fixed-size table in a memory-mapped file (RATE_LIMIT_SHM_PATH), shared by every
+            worker on the host, updated under an fcntl lock. Falls back to local where fcntl
+            is unavailable (Windows).
+    redis   one atomic Lua script per request on RATE_LIMIT_REDIS_URL, shared across hosts.
+            Needs the optional `redis` package.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger("myproject")
+
+
+def gcra(tat, now, interval, period):
+    """(allowed, new TAT, seconds until the next request would be allowed)."""
+    tat = max(tat or now, now)
+    allow_at = tat + interval - period
+    if now < allow_at:
+        return False, tat, allow_at - now
+    return True, tat + interval, 0.0
+
+
+class LocalBackend:
+    # Past this many keys, entries whose TAT has passed (idle clients) are dropped
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        self.tats = {}
+        self.lock = threading.Lock()
+
+    def hit(self, key, interval, period):
+        now = time.time()
+        with self.lock:
+            allowed, self.tats[key], retry_after = gcra(self.tats.get(key), now, interval, period)
+            if len(self.tats) > self.MAX_KEYS:
+                self.tats = {k: tat for k, tat in self.tats.items() if tat > now}
+        return allowed, retry_after
+
+
+class SharedMemoryBackend:
+    """
+    Open-addressed table of (key hash, TAT) slots in a memory-mapped file. A key lives in one
+    of PROBES slots after its home slot; a slot whose TAT has passed is free to reuse, and when
+    none is, the one closest to expiry is taken over, so the file never grows.
+    """
+    SLOT = struct.Struct("<Qd")
+    PROBES = 8
+
+    def __init__(self, path, slots):
+        self.slots = slots
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * self.SLOT.size
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        # fcntl locks exclude other processes only; threads of this one queue here first
+        self.lock = threading.Lock()
+
+    def key_hash(self, key):
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def hit(self, key, interval, period):
+        h = self.key_hash(key)
+        home = h % self.slots
+        with self.lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                found = free = oldest = None
+                for i in range(self.PROBES):
+                    slot = (home + i) % self.slots
+                    slot_hash, slot_tat = self.SLOT.unpack_from(self.map, slot * self.SLOT.size)
+                    if slot_hash == h:
+                        found = (slot, slot_tat)
+                        break
+                    if slot_hash == 0 or slot_tat <= now:
+                        free = slot if free is None else free
+                    elif oldest is None or slot_tat < oldest[1]:
+                        oldest = (slot, slot_tat)
+                if found:
+                    target, tat = found
+                else:
+                    # An evicted key starts over with a full burst
+                    target, tat = (free if free is not None else oldest[0]), None
+                allowed, new_tat, retry_after = gcra(tat, now, interval, period)
+                self.SLOT.pack_into(self.map, target * self.SLOT.size, h, new_tat)
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        return allowed, retry_after
+
+
+class RedisBackend:
+    # TAT kept as a float string; TIME is the server's clock, so every host agrees
+    SCRIPT = """
+    local now_parts = redis.call('TIME')
+    local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+    local interval, period = tonumber(ARGV[1]), tonumber(ARGV[2])
+    local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+    if tat < now then tat = now end
+    local allow_at = tat + interval - period
+    if now < allow_at then
+        return {0, tostring(allow_at - now)}
+    end
+    tat = tat + interval
+    redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+    return {1, '0'}
+    """
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def hit(self, key, interval, period):
+        allowed, retry_after = self.script(keys=[key], args=[interval, period])
+        return bool(allowed), float(retry_after)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def rate_limiter():
+    global _backend
+    if _backend is not None:
+        return _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(getattr(settings, "RATE_LIMIT_BACKEND", "local"))
+        return _backend
+
+
+def create_backend(name):
+    if name == "redis":
+        if redis is None:
+            logger.error("RATE_LIMIT_BACKEND=redis but the redis package is not installed; using local")
+        else:
+            return RedisBackend(settings.RATE_LIMIT_REDIS_URL)
+    elif name == "shm":
+        if fcntl is None:
+            logger.error("RATE_LIMIT_BACKEND=shm needs fcntl (POSIX); using local")
+        else:
+            return SharedMemoryBackend(settings.RATE_LIMIT_SHM_PATH, getattr(settings, "RATE_LIMIT_SHM_SLOTS", 65536))
+    return LocalBackend()
@@ -0,0 +1,110 @@
+# portal_common/read_service.py
+"""
+Client for the read service, used by the create, update and delete services.
+"""
+import copy
+import json
+from collections import OrderedDict
+import httpx
+
+from portal_common.timing import timed
+
+# This must be the correct URL, with NO space at the end of the string.
+READ_SERVICE_URL = "http://localhost:4000/read/api/get-data"
+READ_SERVICE_BATCH_URL = "http://localhost:4000/read/api/get-batch"
+READ_SERVICE_EXISTS_URL = "http://localhost:4000/read/api/exists"
+
+
+def read_headers(user, token):
+    return {
+        "X-User": json.dumps(user),
+        "Authorization": token,
+    }
+
+
+def decode_rows(payload):
+    """Rows of a get-data payload as dicts, whether it came back columnar (format=columns) or not."""
+    if "columns" in payload:
+        columns = payload["columns"]
+        return [dict(zip(columns, row)) for row in payload["rows"]]
+    return payload.get("data", [])
+
+
+async def read_batch(client, user, token, queries):
+    """
+    Sends several get-data sub-queries to the read service in one round trip.
+    `queries` is a list of {key, tableName, filters, fields}; returns {key: rows}.
+    """
+    with timed("http"):
+        response = await client.post(
+            READ_SERVICE_BATCH_URL,
+            # Columnar sub-results send each key name once instead of once per row
+            json={"queries": [{"format": "columns", **query} for query in queries]},
+            headers=read_headers(user, token),
+        )
+    response.raise_for_status()
+    results = response.json().get("data", {})
+    return {key: decode_rows(result) for key, result in results.items()}
+
+
+async def find_user_conflict(client, user, token, data, exclude_table=None, exclude_id=None):
+    """
+    Asks the read service whether any live student/teacher/admin already uses
+    the given email, CNIC or phone. Returns {"table", "id"} of the conflict or None.
+    """
+    params = {k: data[k] for k in ("email", "cnic", "phone") if data.get(k)}
+    if not params:
+        return None
+    if exclude_table:
+        params.update({"excludeTable": exclude_table, "excludeId": exclude_id})
+
+    with timed("http"):
+        response = await client.get(
+            READ_SERVICE_EXISTS_URL,
+            params=params,
+            headers=read_headers(user, token),
+        )
+    response.raise_for_status()
+    result = response.json()
+    return {"table": result["table"], "id": result["id"]} if result.get("exists") else None
+
+
+# --- get-data with ETag revalidation ---
+# A small per-process validator cache: the read service answers a matching If-None-Match
+# with an empty 304, so repeated catalog/record reads only cost a round trip, not a download.
+VALIDATOR_CACHE_SIZE = 256
+_validators = OrderedDict()
+
+
+async def get_data(client, params, headers):
+    """GET get-data and return its `data` rows, revalidating any copy we already hold."""
+    params = {"format": "columns", **params}
+    cache_key = (json.dumps(params, sort_keys=True, default=str), headers.get("X-User") or headers.get("x-user"))
+    cached = _validators.get(cache_key)
+    if cached:
+        headers = {**headers, "If-None-Match": cached[0]}
+
+    with timed("http"):
+        response = await client.get(READ_SERVICE_URL, params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        _validators.move_to_end(cache_key)
+        return copy.deepcopy(cached[1])
+    response.raise_for_status()
+
+    data = decode_rows(response.json())
+    etag = response.headers.get("ETag")
+    # Rows carrying password hashes are never kept around
+    if etag and response.status_code == 200 and str(params.get("includePassword", "")).lower() not in ("true", "1"):
+        _validators[cache_key] = (etag, copy.deepcopy(data))
+        _validators.move_to_end(cache_key)
+        while len(_validators) > VALIDATOR_CACHE_SIZE:
+            _validators.popitem(last=False)
+    return data
+
+
+async def get_exists(client, params, headers):
+    """mode=exists: a LIMIT 1 probe on the read service instead of fetching the rows."""
+    with timed("http"):
+        response = await client.get(READ_SERVICE_URL, params={"mode": "exists", **params}, headers=headers)
+    response.raise_for_status()
+    return response.json()["exists"]
@@ -0,0 +1,145 @@
+# portal_common/timing.py
+"""
+Per-request timing: where a request's time went, as a Server-Timing response header and one
+structured log record ("myproject.timing").
+
+    db        every SQL statement (count + time), via a connection execute_wrapper
+    http      outbound httpx calls             } wrapped at the call sites with timed(...)
+    serialize rows -> dicts / JSON encoding    }
+    bcrypt    password hashing and checks      }
+
+Only TIMING_SAMPLE_RATE (0..1) of requests are measured. For the rest the middleware costs one
+random() call and every probe one contextvar lookup, so it can stay installed in production.
+Time spent after the response is returned (streamed bodies) is not included.
+"""
+import contextvars
+import json
+import logging
+import random
+import time
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger("myproject.timing")
+
+_current = contextvars.ContextVar("request_timing", default=None)
+
+
+class RequestTiming:
+    __slots__ = ('started', 'metrics')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # name -> [count, seconds]
+        self.metrics = {}
+
+    def add(self, name, seconds):
+        metric = self.metrics.get(name)
+        if metric is None:
+            self.metrics[name] = [1, seconds]
+        else:
+            metric[0] += 1
+            metric[1] += seconds
+
+    def finish(self, request, response):
+        total = time.perf_counter() - self.started
+        entries = [
+            f'{name};dur={seconds * 1000:.1f};desc="{count}x"'
+            for name, (count, seconds) in self.metrics.items()
+        ]
+        entries.append(f'total;dur={total * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(entries)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+        }
+        for name, (count, seconds) in self.metrics.items():
+            record[f'{name}_count'] = count
+            record[f'{name}_ms'] = round(seconds * 1000, 2)
+        logger.info(json.dumps(record, separators=(',', ':')))
+        return response
+
+
+class timed:
+    """`with timed('http'): ...` adds the block's duration to the current request, if sampled."""
+    __slots__ = ('name', 'timing', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timing = _current.get()
+        if self.timing is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.timing is not None:
+            self.timing.add(self.name, time.perf_counter() - self.start)
+
+
+# --- DB queries ---
+
+def _time_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.add('db', time.perf_counter() - start)
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    # Per DatabaseWrapper (one per alias and thread), so sync_to_async ORM threads are covered too
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_instrument_connection)
+
+
+# --- Middleware ---
+
+def sampled():
+    rate = getattr(settings, 'TIMING_SAMPLE_RATE', 0.0)
+    return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+@sync_and_async_middleware
+def TimingMiddleware(get_response):
+    # Connections opened before this module was imported (startup checks) missed the signal
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(None, connection)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not sampled():
+                return await get_response(request)
+            timing = RequestTiming()
+            token = _current.set(timing)
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            return timing.finish(request, response)
+    else:
+        def middleware(request):
+            if not sampled():
+                return get_response(request)
+            timing = RequestTiming()
+            token = _current.set(timing)
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            return timing.finish(request, response)
+
+    return middleware
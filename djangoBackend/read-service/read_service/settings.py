@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 import pymysql
 import os
+import sys
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -19,6 +20,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
 pymysql.install_as_MySQLdb()
 
+# Modules shared by the Django services (djangoBackend/portal_common)
+sys.path.append(str(BASE_DIR.parent))
+
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,9 +58,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so it sees the whole request (Server-Timing / per-request timing log)
+    'portal_common.timing.TimingMiddleware',
+    'portal_common.jwt_auth.JWTAuthMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'readserv.basicMiddleware.ReqCheckerMiddleware',
+    'readserv.routers.ReadAfterWriteMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -99,6 +106,54 @@ DATABASES = {
     }
 }
 
+# DB_ENGINE=sqlite runs on local SQLite files instead (the test suite, or trying the replica routing locally)
+DB_IS_SQLITE = os.environ.get("DB_ENGINE") == "sqlite"
+if DB_IS_SQLITE:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get("DB_NAME") or BASE_DIR / "db.sqlite3",
+        }
+    }
+
+# --- Read replicas ---
+# READ_REPLICAS="10.0.0.11,10.0.0.12" adds replica_1, replica_2 with the default credentials
+# (SQLite: file paths). readserv.routers sends reads there; writes and read-after-write stay on default.
+for i, location in enumerate(filter(None, os.environ.get("READ_REPLICAS", "").split(",")), start=1):
+    DATABASES[f"replica_{i}"] = {**DATABASES["default"], ("NAME" if DB_IS_SQLITE else "HOST"): location.strip()}
+
+DATABASE_ROUTERS = ["readserv.routers.ReadReplicaRouter"]
+# Reads stay on the primary this long after the caller's own write (X-Last-Write)
+READ_REPLICA_PIN_SECONDS = int(os.environ.get("READ_REPLICA_PIN_SECONDS", 5))
+# Replicas further behind than this (seconds) are taken out of rotation
+READ_REPLICA_MAX_LAG = int(os.environ.get("READ_REPLICA_MAX_LAG", 5))
+READ_REPLICA_CHECK_INTERVAL = int(os.environ.get("READ_REPLICA_CHECK_INTERVAL", 2))
+
+# get-data search= index (readserv/search.py): full rebuild at least this often (seconds), so
+# rows changed outside the writer services still show up
+SEARCH_INDEX_MAX_AGE = int(os.environ.get("SEARCH_INDEX_MAX_AGE", 600))
+
+# --- Local token verification ---
+# PEM public key (inline or JWT_PUBLIC_KEY_FILE) matching the auth service's JWT_PRIVATE_KEY.
+# When set, portal_common.jwt_auth checks bearer tokens here and X-User comes from the verified
+# claims, so the gateway can skip its /me call (SERVICES_VERIFY_JWT=true there).
+JWT_PUBLIC_KEY_FILE = os.environ.get("JWT_PUBLIC_KEY_FILE")
+JWT_PUBLIC_KEY = Path(JWT_PUBLIC_KEY_FILE).read_text() if JWT_PUBLIC_KEY_FILE else os.environ.get("JWT_PUBLIC_KEY")
+# How often (seconds) the revoked-token list is topped up from the shared cache
+JWT_DENYLIST_POLL = float(os.environ.get("JWT_DENYLIST_POLL", 1.0))
+
+# --- Rate limiting (portal_common/ratelimit.py) ---
+# XUserRateThrottle's counter store: "local" (per process), "shm" (memory-mapped table shared
+# by this host's workers) or "redis" (shared across hosts; needs the redis package)
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "local")
+RATE_LIMIT_SHM_PATH = os.environ.get("RATE_LIMIT_SHM_PATH", str(BASE_DIR / ".ratelimit"))
+RATE_LIMIT_SHM_SLOTS = int(os.environ.get("RATE_LIMIT_SHM_SLOTS", 65536))
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+
+# Share of requests measured by the timing middleware (Server-Timing header + "myproject.timing"
+# log record). 0 turns it off at the cost of one random() call per request.
+TIMING_SAMPLE_RATE = float(os.environ.get("TIMING_SAMPLE_RATE", 0.0))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -119,6 +174,16 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 REST_FRAMEWORK = {
+    # orjson codec with a stdlib fallback (portal_common/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "portal_common.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "portal_common.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_THROTTLE_CLASSES": [
         "readserv.throttles.XUserRateThrottle",
         "rest_framework.throttling.AnonRateThrottle",
@@ -127,11 +192,42 @@ REST_FRAMEWORK = {
         "xuser": "100/minute",
         "anon": "50/minute",
     },
+    # get-data owns ?format= (json / ndjson / json-stream), so DRF must not treat it as a renderer override
+    "URL_FORMAT_OVERRIDE": None,
+}
+
+# --- Caches ---
+# "default" is per-process (throttle history etc.). "shared" must resolve to the same store in
+# every service: it holds the per-table generation counters that writers bump after each write
+# and the read service folds into its response cache keys. The default backend
+# (portal_common/filecache.py) keeps incr atomic and never evicts live keys; in multi-host
+# deployments point SHARED_CACHE_BACKEND / SHARED_CACHE_LOCATION at Redis running without an
+# eviction policy.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": os.getenv("SHARED_CACHE_BACKEND", "portal_common.filecache.SharedFileCache"),
+        "LOCATION": os.getenv("SHARED_CACHE_LOCATION", str(BASE_DIR.parent / ".shared_cache")),
+        "TIMEOUT": None,
+    },
+    # Encoded get-data response bodies, keyed by table generation (see readserv/cache.py)
+    "responses": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
 }
 
 
 import os
-LOG_DIR = os.path.join(BASE_DIR, "logs")
+import tempfile
+# LOG_DIR overrides; test runs log to the temp dir so they leave nothing in the tree
+LOG_DIR = os.getenv("LOG_DIR") or (
+    os.path.join(tempfile.gettempdir(), f"{BASE_DIR.name}-test-logs") if sys.argv[1:2] == ["test"]
+    else os.path.join(BASE_DIR, "logs")
+)
 os.makedirs(LOG_DIR, exist_ok=True)
 
 LOGGING = {
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ReadservConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'readserv'
+
+    def ready(self):
+        # Build every serializer variant once so the read path never pays for class creation/introspection.
+        from .config import TABLE_ACCESS
+        from .serializers import build_serializer_registry
+        build_serializer_registry(TABLE_ACCESS)
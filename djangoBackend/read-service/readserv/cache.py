@@ -0,0 +1,57 @@
+# readserv/cache.py
+import hashlib
+import json
+import time
+from django.core.cache import caches
+
+# The writer services bump this counter after every successful write
+from portal_common.invalidation import GENERATION_KEY
+
+
+def table_generations(tables):
+    """
+    Current generation of each table from the shared cache.
+    A missing counter (first use, or the store was flushed) is seeded with the clock,
+    so it can never fall back to a value that older cached responses were keyed on.
+    """
+    shared = caches['shared']
+    keys = {GENERATION_KEY.format(t): t for t in tables}
+    found = shared.get_many(list(keys))
+    for key in keys:
+        if key not in found:
+            shared.add(key, time.time_ns())
+            found[key] = shared.get(key)
+    return {keys[key]: found[key] for key in keys}
+
+
+# (table, generation) -> when this process first saw it
+_generation_seen = {}
+
+
+def generations_settled(generations, seconds):
+    """
+    True once every generation has been current for `seconds`. A replica whose lag is within
+    that bound has the write behind the generation by then, so its rows are safe to cache.
+    First-seen times only ever err late (a write lands before its bump is visible).
+    """
+    now = time.monotonic()
+    if len(_generation_seen) > 10000:
+        _generation_seen.clear()
+    settled = True
+    for item in generations.items():
+        first_seen = _generation_seen.setdefault(item, now)
+        settled = settled and now - first_seen >= seconds
+    return settled
+
+
+def response_cache_key(*parts):
+    raw = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return "get-data:" + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def get_cached_response(key):
+    return caches['responses'].get(key)
+
+
+def cache_response(key, body):
+    caches['responses'].set(key, body)
@@ -22,21 +22,61 @@ async def enrollment_pre_process(filters, user):
     Ensures that students can only view their own enrollments.
     """
     if user and user.get('type') == 'student':
+        # Drop any caller supplied studentId lookups (e.g. studentId__in) before pinning our own
+        filters = {k: v for k, v in filters.items() if not k.startswith('studentId__')}
         # Apply filter to only show enrollments for the logged-in student's ID
         filters['studentId'] = user.get('id')
     return filters
 
 
+# --- Filter operator whitelists ---
+
+# Bare `field=value` is an exact match; `field=a,b,c` becomes `field__in` when 'in' is allowed.
+# Anything else has to be spelled out (`created_at__gte=...`) and listed here.
+USER_FILTER_OPS = {
+    'id': ['exact', 'in'],
+    'name': ['exact', 'startswith'],
+    'email': ['exact', 'in', 'startswith'],
+    'phone': ['exact', 'in'],
+    'cnic': ['exact', 'in', 'startswith'],
+    'status': ['exact', 'in'],
+    'gender': ['exact', 'isnull'],
+    'isDeleted': ['exact'],
+    'created_at': ['gte', 'lte'],
+}
+
+# Columns nested by `expand=` (never passwords)
+EXPAND_TEACHER_FIELDS = ["id", "name", "email"]
+EXPAND_STUDENT_FIELDS = ["id", "name", "email", "status"]
+EXPAND_COURSE_FIELDS = ["id", "name", "teacherId", "credit_hours", "isDeleted"]
+
+
 # --- TABLE_ACCESS Configuration ---
 
 # NOTE: Fields like 'password' are typically excluded at the Serializer level,
 # but included here to support the special 'includePassword' logic.
 # The `selectFields` define the fields exposed in the serializer.
+# `projection` sends reads through the values() fast path (plain dicts, no ModelSerializer).
+# Tables whose serializer adds related data (course -> teacherName) keep the serializer path.
+# `filter_ops` maps each filterable column to the lookups a caller may use on it.
+# `aggregates` maps the names usable in `aggregate=fn:name` to ORM paths (joins allowed, e.g.
+# enrollment -> course credit hours); `group_by` lists the columns a caller may group on.
+# `order_by` whitelists the columns a caller may sort/paginate on. Only list
+# columns backed by an index in db.sql, otherwise keyset pages turn into filesorts.
+# `expand` lists the relations `expand=` may follow (FK path, nested columns, roles);
+# `depends_on` names the other tables a cached response reads through.
+# `search` lists the columns `search=` matches against (indexed in readserv/search.py).
 TABLE_ACCESS = {
     'student': {
         'model_name': 'Student',
         'allowed_roles': ["admin", "teacher", "student"],
         'select_fields': ["id", "name", "email", "phone", "gender", "cnic", "status", "isDeleted", "password", "created_at"],
+        'filter_ops': USER_FILTER_OPS,
+        'aggregates': {'id': 'id'},
+        'group_by': ["status", "gender", "isDeleted"],
+        'order_by': ["id", "created_at"],
+        'search': ["name", "email", "cnic"],
+        'projection': True,
         'pre_process': None,
         'post_process': None,
     },
@@ -45,6 +85,12 @@ TABLE_ACCESS = {
         'model_name': 'Admin',
         'allowed_roles': ["admin", "teacher", "student"],
         'select_fields': ["id", "name", "email", "phone", "gender", "cnic", "status", "isDeleted", "password", "created_at"],
+        'filter_ops': USER_FILTER_OPS,
+        'aggregates': {'id': 'id'},
+        'group_by': ["status", "gender", "isDeleted"],
+        'order_by': ["id", "created_at"],
+        'search': ["name", "email", "cnic"],
+        'projection': True,
         'pre_process': None,
         'post_process': None,
     },
@@ -53,6 +99,12 @@ TABLE_ACCESS = {
         'model_name': 'Teacher',
         'allowed_roles': ["admin", "teacher", "student"],
         'select_fields': ["id", "name", "email", "phone", "gender", "cnic", "status", "isDeleted", "password", "created_at"],
+        'filter_ops': USER_FILTER_OPS,
+        'aggregates': {'id': 'id'},
+        'group_by': ["status", "gender", "isDeleted"],
+        'order_by': ["id", "created_at"],
+        'search': ["name", "email", "cnic"],
+        'projection': True,
         'pre_process': None,
         'post_process': None,
     },
@@ -61,6 +113,25 @@ TABLE_ACCESS = {
         'model_name': 'Course',
         'allowed_roles': ["admin", "teacher", "student"],
         'select_fields': ["id", "name", "teacherId", "credit_hours", "isDeleted", "created_at"],
+        'filter_ops': {
+            'id': ['exact', 'in'],
+            'name': ['exact', 'startswith'],
+            'teacherId': ['exact', 'in', 'isnull'],
+            'credit_hours': ['exact', 'in', 'gte', 'lte'],
+            'isDeleted': ['exact'],
+            'created_at': ['gte', 'lte'],
+        },
+        'aggregates': {'id': 'id', 'credit_hours': 'credit_hours'},
+        'group_by': ["teacherId", "isDeleted"],
+        'order_by': ["id", "created_at"],
+        'search': ["name"],
+        # expand=teacher nests the projected teacher row (projection path, so no teacherName)
+        'expand': {
+            'teacher': {'table': 'teacher', 'path': 'teacherId', 'fields': EXPAND_TEACHER_FIELDS,
+                        'allowed_roles': ["admin", "teacher", "student"]},
+        },
+        # teacherName is joined in, so cached course responses go stale on teacher writes too
+        'depends_on': ["teacher"],
         # The serializer will use the teacherName property defined there.
         'pre_process': None,
         'post_process': course_post_process,
@@ -70,6 +141,27 @@ TABLE_ACCESS = {
         'model_name': 'Enrollment',
         'allowed_roles': ["admin", "student", "teacher"],
         'select_fields': ["id", "studentId", "courseId", "created_at"],
+        'filter_ops': {
+            'id': ['exact', 'in'],
+            'studentId': ['exact', 'in'],
+            'courseId': ['exact', 'in'],
+            'created_at': ['gte', 'lte'],
+        },
+        'aggregates': {'id': 'id', 'credit_hours': 'courseId__credit_hours'},
+        'group_by': ["studentId", "courseId"],
+        'order_by': ["id", "created_at"],
+        # expand=course,student,course.teacher is one JOINed query instead of follow-up reads
+        'expand': {
+            'course': {'table': 'course', 'path': 'courseId', 'fields': EXPAND_COURSE_FIELDS,
+                       'allowed_roles': ["admin", "student", "teacher"]},
+            'course.teacher': {'table': 'teacher', 'path': 'courseId__teacherId', 'fields': EXPAND_TEACHER_FIELDS,
+                               'allowed_roles': ["admin", "student", "teacher"]},
+            'student': {'table': 'student', 'path': 'studentId', 'fields': EXPAND_STUDENT_FIELDS,
+                        'allowed_roles': ["admin", "teacher"]},
+        },
+        # sum:credit_hours reads through to course
+        'depends_on': ["course"],
+        'projection': True,
         'pre_process': enrollment_pre_process,
         'post_process': None,
     },
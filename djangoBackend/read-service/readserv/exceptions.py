@@ -0,0 +1,8 @@
+# readserv/exceptions.py
+
+class ReadRequestError(Exception):
+    """A read request that cannot be served; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
@@ -0,0 +1,45 @@
+# readserv/management/commands/bench_renderers.py
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from portal_common.renderers import ORJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = "Compares DRF's JSONRenderer with the orjson renderer on a synthetic student listing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed; ORJSONRenderer falls back to DRF"))
+
+        # Shaped like a get-data student read on the projection path (raw datetimes, no password)
+        now = timezone.now()
+        payload = {"data": [
+            {
+                "id": i, "name": f"Student {i}", "email": f"student{i}@example.com", "phone": f"0300{i:07d}",
+                "gender": "female" if i % 2 else "male", "cnic": f"35202{i:08d}", "status": "active",
+                "isDeleted": False, "created_at": now - timedelta(minutes=i),
+            }
+            for i in range(rows)
+        ]}
+
+        results = {}
+        for name, renderer in (("JSONRenderer", JSONRenderer()), ("ORJSONRenderer", ORJSONRenderer())):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                body = renderer.render(payload)
+                timings.append(time.perf_counter() - start)
+            results[name] = min(timings)
+            self.stdout.write(f"{name:<16} best of {repeat}: {min(timings) * 1000:8.2f} ms  ({len(body)} bytes)")
+
+        speedup = results["JSONRenderer"] / results["ORJSONRenderer"]
+        self.stdout.write(self.style.SUCCESS(f"{rows} rows: {speedup:.1f}x faster"))
@@ -1,8 +1,15 @@
 # readserv/mixins.py
+import base64
+import binascii
 import json
 import logging
-from django.apps import apps
 from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.db.models import Q, Sum, Count, Avg, Min, Max
+from portal_common.renderers import dumps, loads
+from readserv.search import normalize, search_index
 
 logger = logging.getLogger("myproject")
 
@@ -15,7 +22,7 @@ class HeaderUserMixin:
             logger.info("Missing X-User header")
             return None
         try:
-            user_data = json.loads(user_header)
+            user_data = loads(user_header)
             return user_data
         except json.JSONDecodeError:
             logger.error("Failed to decode X-User header", exc_info=True)
@@ -37,20 +44,77 @@ class RBACMixin:
         return config, None
 
 
+class FilterMixin:
+    """
+    Compiles query params into ORM lookups using the per-table `filter_ops` whitelist.
+
+        teacherId=1,2,3          -> teacherId__in=[1, 2, 3]
+        created_at__gte=2025-01  -> created_at__gte='2025-01'
+        name__startswith=Ali     -> name__startswith='Ali'
+        teacherId__isnull=true   -> teacherId__isnull=True
+    """
+
+    TRUE_VALUES = ('true', '1')
+    FALSE_VALUES = ('false', '0')
+
+    def parse_filters(self, params, config, model_class):
+        allowed = config.get('filter_ops', {})
+        filters = {}
+
+        for key, value in params.items():
+            field, _, op = key.partition('__')
+            ops = allowed.get(field)
+            if ops is None:
+                raise ValueError(f"Cannot filter on '{field}'")
+
+            if not op:
+                op = 'in' if ',' in value and 'in' in ops else 'exact'
+            if op not in ops:
+                raise ValueError(f"Operator '{op}' is not allowed on '{field}'")
+
+            if op == 'in':
+                value = [self.coerce_value(model_class, field, v.strip()) for v in value.split(',') if v.strip()]
+            elif op == 'isnull':
+                value = self.parse_bool(value)
+            else:
+                value = self.coerce_value(model_class, field, value)
+
+            filters[field if op == 'exact' else f'{field}__{op}'] = value
+
+        return filters
+
+    def coerce_value(self, model_class, field, value):
+        # Query strings carry booleans as true/false, which BooleanField.to_python rejects
+        if model_class._meta.get_field(field).get_internal_type() == 'BooleanField':
+            return self.parse_bool(value)
+        return value
+
+    def parse_bool(self, value):
+        value = value.lower()
+        if value in self.TRUE_VALUES:
+            return True
+        if value in self.FALSE_VALUES:
+            return False
+        raise ValueError(f"Expected true or false, got '{value}'")
+
+
 class QueryMixin:
-    """Handles querying the database with filters, pre/post processing, and async execution."""
+    """Builds the (lazy) queryset with filters and pre/post processing; evaluation is left to the caller."""
 
-    async def get_queryset(self, model_name, filters, pre_process=None, post_process=None, user=None):
+    async def apply_pre_process(self, filters, pre_process=None, user=None):
+        """Runs the table's pre_process hook (e.g. scoping students to their own rows)."""
+        if pre_process:
+            filters = await pre_process(filters, user)
+        return filters
+
+    def build_queryset(self, model_name, filters, post_process=None, user=None):
         try:
             model_class = apps.get_model('readserv', model_name)
         except LookupError:
             raise ValueError(f"Model '{model_name}' not found")
 
-        # Pre-processing
-        if pre_process:
-            filters = await pre_process(filters, user)
-
-        queryset = await sync_to_async(model_class.objects.filter)(**filters)
+        # filter() only builds SQL, no I/O happens until the queryset is iterated
+        queryset = model_class.objects.filter(**filters)
 
         # Post-processing
         if post_process:
@@ -58,16 +122,439 @@ class QueryMixin:
 
         return queryset
 
+    async def get_queryset(self, model_name, filters, pre_process=None, post_process=None, user=None):
+        filters = await self.apply_pre_process(filters, pre_process, user)
+        return self.build_queryset(model_name, filters, post_process, user)
+
+
+class PaginationMixin:
+    """Handles keyset (cursor) pagination over the index-backed `order_by` whitelist."""
+
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 500
+
+    def parse_pagination(self, params, config):
+        """
+        Pops `limit`, `after` and `orderBy` from the query params.
+        Returns None when the caller did not ask for paging or ordering (legacy full read).
+        """
+        limit = params.pop('limit', None)
+        after = params.pop('after', None)
+        order_by = params.pop('orderBy', None)
+
+        if limit is None and after is None and order_by is None:
+            return None
+
+        order_by = order_by or 'id'
+        descending = order_by.startswith('-')
+        field = order_by.lstrip('-')
+        if field not in config.get('order_by', ['id']):
+            raise ValueError(f"Cannot order by '{field}'")
+
+        if limit is not None or after is not None:
+            try:
+                limit = int(limit) if limit is not None else self.DEFAULT_PAGE_SIZE
+            except ValueError:
+                raise ValueError("limit must be an integer")
+            if limit < 1 or limit > self.MAX_PAGE_SIZE:
+                raise ValueError(f"limit must be between 1 and {self.MAX_PAGE_SIZE}")
+
+        return {'field': field, 'descending': descending, 'limit': limit, 'after': after}
+
+    def paginate_queryset(self, queryset, page):
+        """Applies ordering, the keyset predicate for `after` and the LIMIT (+1 to detect a next page)."""
+        field, descending = page['field'], page['descending']
+
+        if page['after']:
+            value, last_id = self.decode_cursor(page['after'], queryset.model, field)
+            op = 'lt' if descending else 'gt'
+            if field == 'id':
+                queryset = queryset.filter(**{f'id__{op}': last_id})
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': last_id})
+                )
+
+        ordering = [field, 'id'] if field != 'id' else ['id']
+        if descending:
+            ordering = [f'-{f}' for f in ordering]
+        queryset = queryset.order_by(*ordering)
+
+        if page['limit'] is not None:
+            queryset = queryset[:page['limit'] + 1]
+        return queryset
+
+    def split_page(self, rows, page):
+        """Trims the look-ahead row and returns (rows, next_cursor)."""
+        if page['limit'] is None or len(rows) <= page['limit']:
+            return rows, None
+        rows = rows[:page['limit']]
+        last = rows[-1]
+        get = last.get if isinstance(last, dict) else lambda f: getattr(last, f)
+        return rows, self.encode_cursor(get(page['field']), get('id'))
+
+    @staticmethod
+    def encode_cursor(value, last_id):
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        raw = json.dumps([value, last_id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor, model_class, field):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            value, last_id = json.loads(raw)
+            value = model_class._meta.get_field(field).to_python(value)
+            return value, int(last_id)
+        except (ValueError, TypeError, ValidationError, binascii.Error):
+            raise ValueError("Invalid cursor")
+
+
+class ProjectionMixin:
+    """
+    Fast path: pushes the projected columns into SQL with values() and returns plain dicts,
+    skipping model instance construction and the ModelSerializer entirely.
+    """
+
+    def resolve_fields(self, requested, select_fields):
+        """Validates an optional comma separated `fields=` subset against the table's select_fields."""
+        if requested is None:
+            return select_fields
+        fields = [f.strip() for f in requested.split(',') if f.strip()]
+        if not fields:
+            raise ValueError("fields must not be empty")
+        invalid = [f for f in fields if f not in select_fields]
+        if invalid:
+            raise ValueError(f"Invalid fields: {', '.join(invalid)}")
+        return fields
+
+    def project_queryset(self, queryset, fields, page=None, extra=()):
+        # Keyset cursors are built from `id` and the order column, so keep them in the SELECT.
+        columns = [*fields, *extra]
+        if page:
+            for key in ('id', page['field']):
+                if key not in columns:
+                    columns.append(key)
+        return queryset.values(*columns)
+
+    def strip_projection_keys(self, rows, fields):
+        """Drops columns that were only selected to build the cursor."""
+        wanted = set(fields)
+        if all(row.keys() == wanted for row in rows):
+            return rows
+        return [{f: row[f] for f in fields} for row in rows]
+
+    def to_columns(self, rows, fields):
+        """
+        format=columns: {"columns": [...], "rows": [[...], ...]} so key names are sent once
+        instead of once per row. Column order follows the projected fields (plus any
+        serializer-computed extras such as teacherName). Columns are the union of every row's
+        keys, since a serializer may leave a key out of some rows; those cells are null.
+        """
+        if not rows:
+            return {"columns": list(fields), "rows": []}
+        columns = list({key: None for row in rows for key in row})
+        return {"columns": columns, "rows": [[row.get(c) for c in columns] for row in rows]}
+
+
+class ExpansionMixin:
+    """
+    expand=course,student,course.teacher: follows the FK paths whitelisted in the table's
+    `expand` config as values() lookups, so the related columns come back JOINed in the
+    same query and are nested into each row as projected objects.
+    """
+
+    def parse_expand(self, params, config, user):
+        """Pops `expand`; returns the relation names, parents before children (course before course.teacher)."""
+        spec = params.pop('expand', None)
+        if spec is None:
+            return []
+
+        allowed = config.get('expand', {})
+        names = set()
+        for name in (n.strip() for n in spec.split(',') if n.strip()):
+            parts = name.split('.')
+            # course.teacher implies course
+            for depth in range(1, len(parts) + 1):
+                names.add('.'.join(parts[:depth]))
+
+        for name in names:
+            relation = allowed.get(name)
+            if relation is None:
+                raise ValueError(f"Cannot expand '{name}'")
+            if user.get('type') not in relation['allowed_roles']:
+                raise PermissionError(f"Access denied for expand '{name}'")
+
+        return sorted(names, key=lambda n: (n.count('.'), n))
+
+    def expand_columns(self, expansions, config):
+        return [
+            f"{config['expand'][name]['path']}__{field}"
+            for name in expansions
+            for field in config['expand'][name]['fields']
+        ]
+
+    def expand_keys(self, expansions):
+        """Top-level keys the nested objects are stored under."""
+        return [name for name in expansions if '.' not in name]
+
+    def nest_expansions(self, rows, expansions, config):
+        for row in rows:
+            for name in expansions:
+                relation = config['expand'][name]
+                path = relation['path']
+                obj = {field: row.pop(f'{path}__{field}') for field in relation['fields']}
+                # A NULL foreign key LEFT JOINs to all-NULL columns
+                if obj.get('id') is None:
+                    obj = None
+
+                parent, _, key = name.rpartition('.')
+                target = row
+                for part in parent.split('.') if parent else []:
+                    target = target.get(part) if target else None
+                if target is not None:
+                    target[key] = obj
+        return rows
+
+
+class SearchMixin:
+    """
+    search=<text>: top-K rows whose `search` columns match the text, ranked exact > prefix >
+    word prefix > substring by the in-process index (readserv/search.py), then read back by
+    primary key through the normal filters/projection.
+    """
+
+    DEFAULT_SEARCH_LIMIT = 10
+    MAX_SEARCH_LIMIT = 50
+    # Filters apply after ranking, so over-fetch candidates to still fill `limit`
+    SEARCH_OVERFETCH = 5
+
+    def parse_search(self, params, config):
+        """Pops `search` (and its `limit`); returns {'text', 'limit'} or None."""
+        text = params.pop('search', None)
+        if text is None:
+            return None
+        if not config.get('search'):
+            raise ValueError("This table does not support search")
+        text = normalize(text)
+        if not text:
+            raise ValueError("search must not be empty")
+        if 'after' in params or 'orderBy' in params:
+            raise ValueError("search results are ranked and cannot be ordered or paged")
+
+        limit = params.pop('limit', self.DEFAULT_SEARCH_LIMIT)
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if limit < 1 or limit > self.MAX_SEARCH_LIMIT:
+            raise ValueError(f"limit must be between 1 and {self.MAX_SEARCH_LIMIT}")
+        return {'text': text, 'limit': limit}
+
+    async def search_ids(self, table, config, search, filtered=False):
+        candidates = search['limit'] * (self.SEARCH_OVERFETCH if filtered else 1)
+        # A stale index refreshes itself with (sync) ORM reads first
+        return await sync_to_async(search_index(table, config).search)(search['text'], candidates)
+
+    def rank_rows(self, rows, ids, limit):
+        """Puts the rows back into index rank order and trims to `limit`."""
+        position = {pk: i for i, pk in enumerate(ids)}
+        key = (lambda row: position[row['id']]) if rows and isinstance(rows[0], dict) else (lambda row: position[row.id])
+        return sorted(rows, key=key)[:limit]
+
+
+class AggregationMixin:
+    """
+    Pushes `aggregate=sum:credit_hours,count:id` (optionally with `groupBy=studentId`)
+    down to the database as aggregate()/annotate() instead of shipping rows to the caller.
+    """
+
+    AGGREGATE_FUNCTIONS = {
+        'sum': lambda path: Sum(path, default=0),
+        'count': lambda path: Count(path),
+        'avg': lambda path: Avg(path),
+        'min': lambda path: Min(path),
+        'max': lambda path: Max(path),
+    }
+
+    def parse_aggregate(self, params, config):
+        """Pops `aggregate`/`groupBy` from the params; returns (expressions, group_by) or None."""
+        spec = params.pop('aggregate', None)
+        group_by = params.pop('groupBy', None)
+        if spec is None:
+            if group_by is not None:
+                raise ValueError("groupBy requires aggregate")
+            return None
+
+        allowed = config.get('aggregates', {})
+        expressions = {}
+        for item in spec.split(','):
+            fn, _, name = item.strip().partition(':')
+            if fn not in self.AGGREGATE_FUNCTIONS:
+                raise ValueError(f"Unknown aggregate function '{fn}'")
+            if name not in allowed:
+                raise ValueError(f"Cannot aggregate on '{name}'")
+            expressions[f'{fn}_{name}'] = self.AGGREGATE_FUNCTIONS[fn](allowed[name])
+
+        group_by = [g.strip() for g in group_by.split(',') if g.strip()] if group_by else []
+        invalid = [g for g in group_by if g not in config.get('group_by', [])]
+        if invalid:
+            raise ValueError(f"Cannot group by: {', '.join(invalid)}")
+
+        return expressions, group_by
+
+    async def run_aggregate(self, queryset, expressions, group_by):
+        if not group_by:
+            return await queryset.aaggregate(**expressions)
+        grouped = queryset.values(*group_by).annotate(**expressions).order_by(*group_by)
+        return [row async for row in grouped]
+
+
+class CountMixin:
+    """
+    mode=count / mode=exists answer with a cardinality instead of rows: a COUNT(*) or a
+    LIMIT 1 probe. totalCount=true adds X-Total-Count to row reads (paged or not), and
+    estimate=true lets large tables answer from the optimizer's statistics instead of counting.
+    """
+
+    MODES = ('rows', 'count', 'exists')
+    # Estimates below this are replaced by an exact COUNT(*), which is cheap at that size
+    ESTIMATE_THRESHOLD = 10000
+
+    def parse_count(self, params):
+        """Pops `mode`, `totalCount` and `estimate`; returns (mode, total_count, estimate)."""
+        mode = params.pop('mode', 'rows')
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown mode '{mode}'")
+        total_count = self.parse_bool(params.pop('totalCount', 'false'))
+        estimate = self.parse_bool(params.pop('estimate', 'false'))
+        return mode, total_count, estimate
+
+    async def count_rows(self, queryset, estimate=False):
+        """Returns (count, estimated)."""
+        if estimate:
+            approx = await sync_to_async(self.estimate_count)(queryset)
+            if approx is not None and approx >= self.ESTIMATE_THRESHOLD:
+                return approx, True
+        return await queryset.acount(), False
+
+    def estimate_count(self, queryset):
+        """
+        MySQL only (None elsewhere): information_schema.TABLES.TABLE_ROWS for an unfiltered
+        table, otherwise the optimizer's EXPLAIN rows x filtered% for the driving table.
+        """
+        db = connections[queryset.db]
+        if db.vendor != 'mysql':
+            return None
+        with db.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] is not None else None
+            sql, params = queryset.values('pk').query.sql_with_params()
+            cursor.execute(f"EXPLAIN {sql}", params)
+            names = [c[0] for c in cursor.description]
+            plan = dict(zip(names, cursor.fetchone()))
+            return int((plan.get('rows') or 0) * float(plan.get('filtered') or 100) / 100)
+
+
+class ExistsProbeMixin:
+    """
+    Answers "is this email/CNIC/phone already taken by a live user?" with one
+    UNION ALL ... LIMIT 1 query over the user tables, instead of shipping every row to the caller.
+    """
+
+    PROBE_TABLES = ('student', 'teacher', 'admin')
+    PROBE_KEYS = ('email', 'cnic', 'phone')
+
+    def find_conflict(self, keys, exclude_table=None, exclude_id=None):
+        """Returns (table, id) of the first live row matching any key, or None."""
+        qn = connection.ops.quote_name
+        branches, params = [], []
+
+        for table in self.PROBE_TABLES:
+            db_table = apps.get_model('readserv', self.TABLE_ACCESS[table]['model_name'])._meta.db_table
+            # One branch per key so every branch is a single (key, isDeleted) index lookup
+            for key, value in keys.items():
+                sql = f"SELECT %s AS tbl, {qn('id')} FROM {qn(db_table)} WHERE {qn(key)} = %s AND {qn('isDeleted')} = %s"
+                params.extend([table, value, False])
+                if table == exclude_table and exclude_id is not None:
+                    sql += f" AND {qn('id')} <> %s"
+                    params.append(exclude_id)
+                branches.append(sql)
+
+        with connection.cursor() as cursor:
+            cursor.execute(" UNION ALL ".join(branches) + " LIMIT 1", params)
+            row = cursor.fetchone()
+        return (row[0], row[1]) if row else None
+
 
 class SerializerMixin:
-    """Handles dynamic serialization of querysets."""
+    """Handles serialization of querysets through the precompiled serializer registry."""
 
-    def serialize_queryset(self, queryset, model_name, select_fields):
-        from .serializers import create_dynamic_serializer, CourseSerializer
+    def serialize_queryset(self, queryset, model_name, select_fields, include_password=False):
+        from .serializers import get_serializer_class
 
-        SerializerClass = CourseSerializer if model_name.lower() == "course" else create_dynamic_serializer(
+        SerializerClass = get_serializer_class(
             apps.get_model('readserv', model_name),
-            fields=select_fields
+            select_fields,
+            include_password
         )
         serializer = SerializerClass(queryset, many=True)
         return serializer.data
+
+
+class StreamingMixin:
+    """
+    format=ndjson / format=json-stream: rows are pulled with iterator(chunk_size=...) and
+    encoded one chunk at a time into a StreamingHttpResponse, so memory stays flat however
+    large the result is and the first bytes leave as soon as the first chunk is fetched.
+    """
+
+    STREAM_CHUNK_SIZE = 1000
+    STREAM_CONTENT_TYPES = {
+        'ndjson': 'application/x-ndjson',
+        'json-stream': 'application/json',
+    }
+
+    def encode_row(self, row):
+        # Same codec as the buffered responses (see portal_common/renderers.py)
+        return dumps(row)
+
+    def encode_chunk(self, rows, fmt, first):
+        if fmt == 'ndjson':
+            return b''.join(self.encode_row(row) + b'\n' for row in rows)
+        body = b','.join(self.encode_row(row) for row in rows)
+        return body if first else b',' + body
+
+    def stream_chunks(self, queryset, serialize, fmt):
+        if fmt == 'json-stream':
+            yield b'{"data":['
+        chunk, first = [], True
+        for row in queryset.iterator(chunk_size=self.STREAM_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) == self.STREAM_CHUNK_SIZE:
+                yield self.encode_chunk(serialize(chunk), fmt, first)
+                chunk, first = [], False
+        if chunk:
+            yield self.encode_chunk(serialize(chunk), fmt, first)
+        if fmt == 'json-stream':
+            yield b']}'
+
+    async def astream_chunks(self, queryset, serialize, fmt):
+        if fmt == 'json-stream':
+            yield b'{"data":['
+        chunk, first = [], True
+        async for row in queryset.aiterator(chunk_size=self.STREAM_CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) == self.STREAM_CHUNK_SIZE:
+                yield self.encode_chunk(serialize(chunk), fmt, first)
+                chunk, first = [], False
+        if chunk:
+            yield self.encode_chunk(serialize(chunk), fmt, first)
+        if fmt == 'json-stream':
+            yield b']}'
@@ -0,0 +1,153 @@
+# readserv/routers.py
+"""
+Read-replica routing for the read service.
+
+Every DATABASES alias named replica_* serves reads; writes, migrations and anything pinned
+stay on `default`. A request is pinned to the primary while the caller's own last write is
+younger than READ_REPLICA_PIN_SECONDS, signalled by the X-Last-Write header the
+create/update/delete services return (or the per-user marker they leave in the shared cache).
+
+Replica health and lag are probed off the request path by a daemon thread, so routing itself
+never touches the network; when no replica is healthy, reads fall back to the primary.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+
+from portal_common.invalidation import LAST_WRITE_HEADER, LAST_WRITE_KEY
+from portal_common.renderers import loads
+
+logger = logging.getLogger("myproject")
+
+_pin_primary = contextvars.ContextVar("readserv_pin_primary", default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica_")]
+
+
+class ReplicaHealth:
+    """Background probe: SELECT 1 on every replica, plus replication lag on MySQL."""
+
+    def __init__(self):
+        self.healthy = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                # Optimistic until the first probe says otherwise
+                self.healthy = replica_aliases()
+                self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.healthy = [alias for alias in replica_aliases() if self.check(alias)]
+            time.sleep(getattr(settings, "READ_REPLICA_CHECK_INTERVAL", 2))
+
+    def check(self, alias):
+        try:
+            connection = connections[alias]
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                if connection.vendor == "mysql":
+                    lag = self.replication_lag(cursor)
+                    if lag is None or lag > getattr(settings, "READ_REPLICA_MAX_LAG", 5):
+                        logger.warning(f"Replica '{alias}' skipped: replication lag {lag}")
+                        return False
+            return True
+        except Exception as e:
+            logger.warning(f"Replica '{alias}' unhealthy: {e}")
+            connections[alias].close()
+            return False
+
+    @staticmethod
+    def replication_lag(cursor):
+        """Seconds_Behind_Source (None while replication is stopped)."""
+        for statement, column in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                                  ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+            try:
+                cursor.execute(statement)
+            except Exception:
+                continue
+            row = cursor.fetchone()
+            if row is None:
+                return 0  # not a replica (e.g. a read-only endpoint of the same server)
+            names = [c[0] for c in cursor.description]
+            return row[names.index(column)]
+        return None
+
+
+replica_health = ReplicaHealth()
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _pin_primary.get() or not replica_aliases():
+            return "default"
+        replica_health.start()
+        healthy = replica_health.healthy
+        return random.choice(healthy) if healthy else "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+def wants_primary(request):
+    """True while the caller's last write may not have reached the replicas yet."""
+    window = getattr(settings, "READ_REPLICA_PIN_SECONDS", 5)
+    last_write = request.headers.get(LAST_WRITE_HEADER)
+    if last_write is None:
+        # No header: fall back to the marker the writer services leave per user
+        try:
+            user = loads(request.headers.get("X-User", ""))
+            last_write = caches["shared"].get(LAST_WRITE_KEY.format(user.get("type"), user.get("id")))
+        except Exception:
+            return False
+    try:
+        return time.time() - int(last_write) / 1000 < window
+    except (TypeError, ValueError):
+        return False
+
+
+@sync_and_async_middleware
+def ReadAfterWriteMiddleware(get_response):
+    """Pins the request to the primary database (see wants_primary)."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not replica_aliases():
+                return await get_response(request)
+            # The shared-cache lookup blocks, so not on the event loop
+            pinned = await sync_to_async(wants_primary, thread_sensitive=False)(request)
+            token = _pin_primary.set(pinned)
+            try:
+                return await get_response(request)
+            finally:
+                _pin_primary.reset(token)
+    else:
+        def middleware(request):
+            if not replica_aliases():
+                return get_response(request)
+            token = _pin_primary.set(wants_primary(request))
+            try:
+                return get_response(request)
+            finally:
+                _pin_primary.reset(token)
+
+    return middleware
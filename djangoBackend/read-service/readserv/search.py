@@ -0,0 +1,296 @@
+# readserv/search.py
+"""
+In-process search index behind get-data's `search=` mode (columns listed in TABLE_ACCESS `search`).
+
+Per table it keeps every row's searchable values, lower-cased, as
+- two sorted term lists (whole values, and the words inside them) answered with bisect,
+  so a prefix lookup costs O(log n + k) however large the table is, and
+- trigram postings (compact int arrays) that narrow substring matches to the rows sharing
+  the query's rarest trigram before checking them against the current values. Postings are
+  only ever appended to (removing from a 100k-long array costs more than re-checking), so
+  they may hold stale ids until the next rebuild.
+
+Writers record the ids each write touched under the new table generation (see
+portal_common/invalidation.py), so a moved generation re-reads just those rows. A gap in that
+log, or an index older than SEARCH_INDEX_MAX_AGE, rebuilds the index in a background thread
+while the old one keeps answering. The first build runs in the background too; until it
+lands, searches are answered by the database (icontains). Database reads never hold the
+index lock, and always go to the primary: the changed ids may not have reached a replica yet.
+"""
+import bisect
+import logging
+import re
+import sys
+import threading
+import time
+from array import array
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+
+from portal_common.invalidation import CHANGES_KEY
+
+from .cache import table_generations
+
+logger = logging.getLogger("myproject")
+
+# Past this many missed generations a rebuild is cheaper than replaying the change log
+MAX_REPLAY = 500
+MIN_SUBSTRING = 3
+# Prefix matches looked at per result before ranking them by length
+PREFIX_WINDOW = 4
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    """Lower-cased with whitespace collapsed; also what queries go through."""
+    return ' '.join(str(text).lower().split())
+
+
+def value_terms(values):
+    """Whole values, plus a separator-free variant (12345-1234567-1 -> 1234512345671)."""
+    terms = set()
+    for value in values:
+        terms.add(value)
+        compact = _NON_WORD.sub('', value)
+        if compact:
+            terms.add(compact)
+    return terms
+
+
+def word_terms(values):
+    """Words inside a value; for emails only the local part, or every address matches "com"."""
+    terms = set()
+    for value in values:
+        terms.update(w for w in _NON_WORD.split(value.partition('@')[0]) if len(w) > 1)
+    return terms - set(values)
+
+
+def trigrams(values):
+    return {value[i:i + 3] for value in values for i in range(len(value) - 2)}
+
+
+class TermList:
+    """Sorted (term, id) pairs kept as two parallel lists; ids ascend within a term."""
+
+    def __init__(self, pairs=()):
+        pairs = sorted(pairs)
+        self.terms = [t for t, _ in pairs]
+        self.ids = [i for _, i in pairs]
+
+    def position(self, term, pk):
+        lo = bisect.bisect_left(self.terms, term)
+        hi = bisect.bisect_right(self.terms, term, lo)
+        return bisect.bisect_left(self.ids, pk, lo, hi), hi
+
+    def add(self, term, pk):
+        i, _ = self.position(term, pk)
+        self.terms.insert(i, term)
+        self.ids.insert(i, pk)
+
+    def remove(self, term, pk):
+        i, hi = self.position(term, pk)
+        if i < hi and self.ids[i] == pk:
+            del self.terms[i], self.ids[i]
+
+    def prefixed(self, prefix):
+        """(term, id) for every term starting with prefix, in term order."""
+        i = bisect.bisect_left(self.terms, prefix)
+        while i < len(self.terms) and self.terms[i].startswith(prefix):
+            yield self.terms[i], self.ids[i]
+            i += 1
+
+
+class SearchIndex:
+    def __init__(self, table, config):
+        self.table = table
+        self.model = apps.get_model('readserv', config['model_name'])
+        self.fields = config['search']
+        self.generation = None
+        self.built_at = 0
+        self.docs = {}
+        self.values = TermList()
+        self.words = TermList()
+        self.grams = {}
+        self.lock = threading.Lock()
+        self.rebuilding = False
+
+    # --- Building ---
+
+    def load(self, queryset):
+        for pk, *values in queryset.values_list('id', *self.fields).iterator(chunk_size=5000):
+            yield pk, tuple(sys.intern(normalize(v)) for v in values if v)
+
+    def build(self):
+        """A complete index state from the primary; touches no attribute of self."""
+        docs = dict(self.load(self.model.objects.using(DEFAULT_DB_ALIAS)))
+        grams = {}
+        for pk, values in docs.items():
+            for gram in trigrams(values):
+                grams.setdefault(gram, array('i')).append(pk)
+        values = TermList((t, pk) for pk, v in docs.items() for t in value_terms(v))
+        words = TermList((t, pk) for pk, v in docs.items() for t in word_terms(v))
+        return docs, values, words, grams
+
+    def install(self, state, generation):
+        self.docs, self.values, self.words, self.grams = state
+        self.generation, self.built_at = generation, time.monotonic()
+
+    def rebuild(self, generation):
+        """Builds a fresh state from the primary; the lock is only held to swap it in."""
+        started = time.monotonic()
+        state = self.build()
+        with self.lock:
+            # Changes replayed onto the old state meanwhile are replayed again from here
+            self.install(state, generation)
+        logger.info(f"Search index '{self.table}' built: {len(state[0])} rows in {time.monotonic() - started:.2f}s")
+
+    def rebuild_in_background(self, generation):
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+
+        def run():
+            try:
+                self.rebuild(generation)
+            except Exception as e:
+                logger.error(f"Search index '{self.table}' rebuild failed: {e}", exc_info=True)
+            finally:
+                self.rebuilding = False
+                connections[DEFAULT_DB_ALIAS].close()
+
+        threading.Thread(target=run, name=f"search-index-{self.table}", daemon=True).start()
+
+    # --- Incremental updates ---
+
+    def load_rows(self, ids):
+        """Current values of the given rows, read without the lock."""
+        return dict(self.load(self.model.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=ids)))
+
+    def apply(self, ids, fresh):
+        """Puts re-read rows into the index (under the lock); ids missing from fresh are dropped."""
+        for pk in ids:
+            old, new = self.docs.pop(pk, ()), fresh.get(pk, ())
+            if new:
+                self.docs[pk] = new
+            # Only terms that changed: list inserts/deletes shift the whole list
+            for terms, extract in ((self.values, value_terms), (self.words, word_terms)):
+                before, after = extract(old), extract(new)
+                for term in before - after:
+                    terms.remove(term, pk)
+                for term in after - before:
+                    terms.add(term, pk)
+            for gram in trigrams(new) - trigrams(old):
+                self.grams.setdefault(gram, array('i')).append(pk)
+
+    def refresh(self):
+        """
+        Brings the index up to the table's current generation, or starts a background rebuild
+        that will. The shared cache and the database are read before taking the lock.
+        """
+        generation = table_generations([self.table])[self.table]
+        base = self.generation
+        if base is None:
+            return self.rebuild_in_background(generation)
+
+        expired = time.monotonic() - self.built_at > getattr(settings, 'SEARCH_INDEX_MAX_AGE', 600)
+        if generation == base and not expired:
+            return
+        missed = range(base + 1, generation + 1)
+        if not expired and 0 < len(missed) <= MAX_REPLAY:
+            changes = caches['shared'].get_many([CHANGES_KEY.format(self.table, g) for g in missed])
+            if len(changes) == len(missed):
+                ids = {pk for ids in changes.values() for pk in ids}
+                fresh = self.load_rows(ids)
+                with self.lock:
+                    # Skipped if another request (or a rebuild) moved the index on meanwhile
+                    if self.generation == base:
+                        self.apply(ids, fresh)
+                        self.generation = generation
+                return
+        # A write without an id log (or an evicted one), a reseeded counter or an old index
+        self.rebuild_in_background(generation)
+
+    # --- Querying ---
+
+    def prefix_matches(self, terms, text, limit):
+        """Ids whose term starts with text; exact terms first, then shorter terms."""
+        window = []
+        for term, pk in terms.prefixed(text):
+            window.append((term != text, len(term), term, pk))
+            if len(window) >= limit * PREFIX_WINDOW:
+                break
+        return [pk for *_, pk in sorted(window)]
+
+    def substring_matches(self, text):
+        grams = [self.grams.get(gram) for gram in trigrams([text])]
+        if not all(grams):
+            return
+        seen = set()
+        for pk in min(grams, key=len):
+            if pk not in seen and text in '\t'.join(self.docs.get(pk, ())):
+                seen.add(pk)
+                yield pk
+
+    def fallback(self, text, limit):
+        """
+        Answers from the database while the first build runs: rows with the text in a search
+        column (icontains), ranked by the same tiers as the index.
+        """
+        match = Q()
+        for field in self.fields:
+            match |= Q(**{f'{field}__icontains': text})
+        rows = self.model.objects.using(DEFAULT_DB_ALIAS).filter(match).order_by('id')[:limit * PREFIX_WINDOW]
+
+        ranked = []
+        for pk, values in self.load(rows):
+            for tier, terms in enumerate((value_terms(values), word_terms(values))):
+                matched = [term for term in terms if term.startswith(text)]
+                if matched:
+                    # Exact terms first, then shorter terms, as in prefix_matches
+                    term = min(matched, key=lambda t: (t != text, len(t)))
+                    ranked.append((tier, term != text, len(term), pk))
+                    break
+            else:
+                if len(text) >= MIN_SUBSTRING:
+                    ranked.append((2, False, 0, pk))
+        return [key[-1] for key in sorted(ranked)[:limit]]
+
+    def search(self, text, limit):
+        """
+        Up to `limit` ids, best first: a whole value equal to or starting with the text, then
+        a word starting with it, then (3+ characters) the text anywhere in a value.
+        """
+        text = normalize(text)
+        self.refresh()
+        if self.generation is None:
+            # The first build is still running
+            return self.fallback(text, limit)
+
+        with self.lock:
+            tiers = [self.prefix_matches(self.values, text, limit), self.prefix_matches(self.words, text, limit)]
+            if len(text) >= MIN_SUBSTRING:
+                tiers.append(self.substring_matches(text))
+
+            ranked = {}
+            for tier in tiers:
+                for pk in tier:
+                    ranked.setdefault(pk, None)
+                    if len(ranked) >= limit:
+                        return list(ranked)
+            return list(ranked)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def search_index(table, config):
+    with _indexes_lock:
+        if table not in _indexes:
+            _indexes[table] = SearchIndex(table, config)
+        return _indexes[table]
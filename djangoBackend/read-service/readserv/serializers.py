@@ -1,4 +1,6 @@
 # readserv/serializers.py
+import copy
+from django.apps import apps
 from rest_framework import serializers
 # Import all your models
 from .models import Admin, Teacher, Student, Course, Enrollment, Token 
@@ -49,4 +51,50 @@ class CourseSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'teacherId': {'read_only': True},
             'teacherName': {'read_only': True}
-        }
\ No newline at end of file
+        }
+
+
+# --- Precompiled Serializer Registry ---
+
+# (model_class, tuple(fields), include_password) -> precompiled serializer class
+SERIALIZER_REGISTRY = {}
+
+
+class PrecompiledFieldsMixin:
+    """
+    Hands out a copy of the field map that was introspected once at startup,
+    instead of letting ModelSerializer re-introspect the model on every request.
+    """
+    _compiled_fields = None
+
+    def get_fields(self):
+        return copy.deepcopy(self._compiled_fields)
+
+
+def compile_serializer(serializer_class):
+    """Runs the ModelSerializer introspection once and bakes the resulting fields into a subclass."""
+    compiled_fields = serializer_class().get_fields()
+    return type(
+        serializer_class.__name__,
+        (PrecompiledFieldsMixin, serializer_class),
+        {'_compiled_fields': compiled_fields}
+    )
+
+
+def get_serializer_class(model_class, fields, include_password):
+    """Returns the cached serializer for this variant, compiling it on first use."""
+    key = (model_class, tuple(fields), include_password)
+    serializer_class = SERIALIZER_REGISTRY.get(key)
+    if serializer_class is None:
+        base = CourseSerializer if model_class is Course else create_dynamic_serializer(model_class, list(fields))
+        serializer_class = SERIALIZER_REGISTRY[key] = compile_serializer(base)
+    return serializer_class
+
+
+def build_serializer_registry(table_access):
+    """Compiles every TABLE_ACCESS variant (with and without password) up front. Called from AppConfig.ready()."""
+    for config in table_access.values():
+        model_class = apps.get_model('readserv', config['model_name'])
+        for include_password in (False, True):
+            fields = [f for f in config['select_fields'] if include_password or f != 'password']
+            get_serializer_class(model_class, fields, include_password)
@@ -1,3 +1,1001 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import decimal
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from unittest import mock, skipUnless
+import httpx
+import jwt
+from asgiref.sync import async_to_sync, sync_to_async
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
 
-# Create your tests here.
+from portal_common import jwt_auth, ratelimit, read_service
+from portal_common.invalidation import LAST_WRITE_HEADER, LAST_WRITE_KEY, bump_table_generation
+from portal_common.jwt_auth import (
+    ENTRY_WRITE_GRACE, REVOKED_COUNT_KEY, REVOKED_ENTRY_KEY, REVOKED_WINDOW, Denylist,
+)
+from portal_common.ratelimit import LocalBackend, SharedMemoryBackend, fcntl, gcra
+from portal_common.renderers import ORJSONRenderer, dumps, loads
+
+from readserv import search
+from readserv.mixins import ProjectionMixin
+from readserv.models import Course, Enrollment, Student, Teacher
+from readserv.routers import replica_aliases, replica_health
+from readserv.throttles import XUserRateThrottle
+from readserv.views import ExistsProbeView
+
+
+class SharedCacheMixin:
+    """Points a file-based "shared" cache at a scratch directory for the test."""
+    def setUp(self):
+        super().setUp()
+        shared = dict(settings.CACHES["shared"])
+        if "file" in shared["BACKEND"].lower():
+            shared["LOCATION"] = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, shared["LOCATION"], True)
+        override = override_settings(CACHES={**settings.CACHES, "shared": shared})
+        override.enable()
+        self.addCleanup(override.disable)
+        caches["shared"].clear()
+
+
+class ReadServiceTestCase(SharedCacheMixin, TestCase):
+    """
+    Calls get-data against the test database: DB_ENGINE=sqlite python manage.py test readserv
+    """
+    ADMIN = json.dumps({"id": 1, "type": "admin"})
+
+    @classmethod
+    def setUpClass(cls):
+        # The models are unmanaged, so the test databases start without their tables
+        for alias in cls.databases:
+            with connections[alias].schema_editor() as editor:
+                for model in apps.get_app_config("readserv").get_models():
+                    if model._meta.db_table not in connections[alias].introspection.table_names():
+                        editor.create_model(model)
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        # Each test's rows are rolled back without a write bumping any generation
+        caches["responses"].clear()
+        # Reads stay on `default` unless a test marks a replica healthy itself (no probe thread)
+        patcher = mock.patch.object(replica_health, "start")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, replica_health, "healthy", [])
+        replica_health.healthy = []
+        # Every test starts with the full XUserRateThrottle allowance
+        patcher = mock.patch.object(ratelimit, "_backend", ratelimit.LocalBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_data(self, params, user=None, **extra):
+        return self.client.get("/api/get-data", params, HTTP_X_USER=user or self.ADMIN, **extra)
+
+
+class KeysetPaginationTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = [
+            Teacher.objects.create(name=f"t{i}", email=f"t{i}@x.com", password="h").id
+            for i in range(5)
+        ]
+
+    def pages(self, params):
+        """Follows `next` cursors to the end; returns the ids on each page."""
+        pages, after = [], None
+        while True:
+            response = self.get_data({"tableName": "teacher", **params, **({"after": after} if after else {})})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            pages.append([row["id"] for row in body["data"]])
+            after = body["next"]
+            if after is None:
+                return pages
+
+    def test_cursor_walks_every_row_once(self):
+        self.assertEqual(self.pages({"limit": 2}), [self.ids[0:2], self.ids[2:4], self.ids[4:]])
+
+    def test_descending_order(self):
+        self.assertEqual(self.pages({"limit": 3, "orderBy": "-id"}), [self.ids[:1:-1], self.ids[1::-1]])
+
+    def test_non_id_order_breaks_ties_by_id(self):
+        # Rows created in one go may share a created_at; the cursor must still not skip or repeat any
+        Teacher.objects.update(created_at=Teacher.objects.first().created_at)
+        self.assertEqual(sum(self.pages({"limit": 2, "orderBy": "created_at"}), []), self.ids)
+
+    def test_rejects_unindexed_order_bad_limit_and_bad_cursor(self):
+        for params in ({"orderBy": "name"}, {"limit": "0"}, {"limit": "x"}, {"after": "not-a-cursor"}):
+            self.assertEqual(self.get_data({"tableName": "teacher", **params}).status_code, 400, params)
+
+    def test_no_paging_params_reads_everything(self):
+        body = self.get_data({"tableName": "teacher"}).json()
+        self.assertEqual(sorted(row["id"] for row in body["data"]), self.ids)
+        self.assertNotIn("next", body)
+        self.assertNotIn("password", body["data"][0])
+
+
+class ProjectionTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            Teacher.objects.create(name=f"t{i}", email=f"t{i}@x.com", password="h", phone=str(i))
+
+    def test_fields_narrow_the_columns(self):
+        body = self.get_data({"tableName": "teacher", "fields": "name,phone"}).json()
+        self.assertEqual(body["data"], [{"name": f"t{i}", "phone": str(i)} for i in range(3)])
+
+    def test_cursor_columns_are_not_returned(self):
+        body = self.get_data({"tableName": "teacher", "fields": "name", "limit": 2}).json()
+        self.assertEqual(body["data"], [{"name": "t0"}, {"name": "t1"}])
+        body = self.get_data({"tableName": "teacher", "fields": "name", "limit": 2, "after": body["next"]}).json()
+        self.assertEqual(body["data"], [{"name": "t2"}])
+
+    def test_password_needs_include_password(self):
+        self.assertEqual(self.get_data({"tableName": "teacher", "fields": "id,password"}).status_code, 400)
+        body = self.get_data({"tableName": "teacher", "fields": "id,password", "includePassword": "true"}).json()
+        self.assertEqual(body["data"][0]["password"], "h")
+        self.assertNotIn("password", self.get_data({"tableName": "teacher"}).json()["data"][0])
+
+    def test_unknown_or_empty_fields_are_rejected(self):
+        self.assertEqual(self.get_data({"tableName": "teacher", "fields": "id,salary"}).status_code, 400)
+        self.assertEqual(self.get_data({"tableName": "teacher", "fields": ","}).status_code, 400)
+
+    def test_strip_checks_every_row(self):
+        rows = [{"name": "a"}, {"name": "b", "id": 2}]
+        self.assertEqual(ProjectionMixin().strip_projection_keys(rows, ["name"]), [{"name": "a"}, {"name": "b"}])
+
+
+class AsyncReadViewTests(ReadServiceTestCase):
+    """get-data-async through the ASGI handler (AsyncClient)."""
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            Teacher.objects.create(name=f"t{i}", email=f"t{i}@x.com", password="h")
+
+    async def get_async(self, params):
+        return await self.async_client.get("/api/get-data-async", params, headers={"X-User": self.ADMIN})
+
+    async def test_answers_like_get_data(self):
+        response = await self.get_async({"tableName": "teacher", "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        expected = await sync_to_async(self.get_data)({"tableName": "teacher", "limit": 2})
+        self.assertEqual(response.json(), expected.json())
+
+    async def test_errors_keep_their_status(self):
+        self.assertEqual((await self.get_async({"tableName": "teacher", "orderBy": "name"})).status_code, 400)
+        self.assertEqual((await self.get_async({"tableName": "nope"})).status_code, 400)
+        response = await self.async_client.get("/api/get-data-async", {"tableName": "teacher"})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_throttle_runs_off_the_event_loop(self):
+        def allow_request(throttle, request, view):
+            with self.assertRaises(RuntimeError):
+                asyncio.get_running_loop()
+            return False
+        with mock.patch.object(XUserRateThrottle, "allow_request", allow_request):
+            response = await self.get_async({"tableName": "teacher"})
+        self.assertEqual(response.status_code, 429)
+
+
+class FilterGrammarTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teachers = [Teacher.objects.create(name=f"t{i}", email=f"t{i}@x.com", password="h") for i in range(3)]
+        cls.courses = [
+            Course.objects.create(name="algebra", teacherId=cls.teachers[0], credit_hours=2),
+            Course.objects.create(name="biology", teacherId=cls.teachers[1], credit_hours=3),
+            Course.objects.create(name="botany", teacherId=cls.teachers[2], credit_hours=4, isDeleted=True),
+            Course.objects.create(name="chemistry", teacherId=None, credit_hours=4),
+        ]
+
+    def course_names(self, params, user=None):
+        response = self.get_data({"tableName": "course", **params}, user)
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(row["name"] for row in response.json()["data"])
+
+    def test_comma_list_is_an_in_lookup(self):
+        ids = f"{self.teachers[0].id},{self.teachers[2].id}"
+        self.assertEqual(self.course_names({"teacherId": ids}), ["algebra", "botany"])
+
+    def test_spelled_out_operators(self):
+        self.assertEqual(self.course_names({"credit_hours__gte": "4"}), ["botany", "chemistry"])
+        self.assertEqual(self.course_names({"name__startswith": "b"}), ["biology", "botany"])
+        self.assertEqual(self.course_names({"teacherId__isnull": "true"}), ["chemistry"])
+
+    def test_booleans_are_coerced(self):
+        self.assertEqual(self.course_names({"isDeleted": "false"}), ["algebra", "biology", "chemistry"])
+        self.assertEqual(self.course_names({"isDeleted": "1"}), ["botany"])
+
+    def test_unlisted_columns_and_operators_are_rejected(self):
+        for table, params in [
+            ("course", {"salary": "1"}),
+            ("course", {"name__contains": "o"}),
+            ("course", {"isDeleted": "maybe"}),
+            ("teacher", {"password": "h"}),
+            ("teacher", {"password__startswith": "$2b$"}),
+        ]:
+            response = self.get_data({"tableName": table, **params})
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("error", response.json())
+
+    def test_student_cannot_widen_their_enrollments(self):
+        students = [Student.objects.create(name=f"s{i}", email=f"s{i}@x.com", password="h") for i in range(2)]
+        for student in students:
+            Enrollment.objects.create(studentId=student, courseId=self.courses[0])
+        user = json.dumps({"id": students[0].id, "type": "student"})
+        response = self.get_data(
+            {"tableName": "enrollment", "studentId__in": f"{students[0].id},{students[1].id}"}, user,
+        )
+        self.assertEqual([row["studentId"] for row in response.json()["data"]], [students[0].id])
+
+
+class BatchReadTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Teacher.objects.create(name="t", email="t@x.com", password="h", cnic="1")
+        cls.student = Student.objects.create(name="s", email="s@x.com", password="h")
+
+    def batch(self, queries, user=None):
+        return self.client.post(
+            "/api/get-batch", {"queries": queries}, content_type="application/json", HTTP_X_USER=user or self.ADMIN,
+        )
+
+    def test_sub_queries_answer_like_get_data(self):
+        response = self.batch([
+            {"key": "by-email", "tableName": "teacher", "filters": {"email": "t@x.com", "isDeleted": False}, "fields": ["id"]},
+            {"key": "by-cnic", "tableName": "student", "filters": {"cnic": "1"}, "fields": ["id"]},
+            {"tableName": "teacher", "filters": {"id": [self.teacher.id, 999]}, "limit": 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()["data"]
+        self.assertEqual(data["by-email"], {"data": [{"id": self.teacher.id}]})
+        self.assertEqual(data["by-cnic"], {"data": []})
+        single = self.get_data({"tableName": "teacher", "id": f"{self.teacher.id},999", "limit": 1}).json()
+        self.assertEqual(data["teacher"], single)
+
+    def test_a_failing_sub_query_fails_the_batch_with_its_key(self):
+        response = self.batch([
+            {"key": "ok", "tableName": "teacher"},
+            {"key": "bad", "tableName": "teacher", "filters": {"password": "h"}},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()["error"].startswith("bad: "))
+        self.assertEqual(self.batch([{"key": "x", "tableName": "tokens"}]).status_code, 400)
+
+    def test_malformed_batches_are_rejected(self):
+        for queries in (
+            [],
+            [{"filters": {}}],
+            [{"key": "a", "tableName": "teacher"}, {"key": "a", "tableName": "student"}],
+            [{"tableName": "teacher", "filters": ["id"]}],
+            [{"key": str(i), "tableName": "teacher"} for i in range(21)],
+        ):
+            self.assertEqual(self.batch(queries).status_code, 400, queries)
+        response = self.client.post("/api/get-batch", {"queries": [{"tableName": "teacher"}]}, content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+
+class ExistsProbeTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(name="s", email="s@x.com", password="h", cnic="111", phone="0300")
+        Teacher.objects.create(name="gone", email="gone@x.com", password="h", cnic="222", isDeleted=True)
+
+    def probe(self, params):
+        return self.client.get("/api/exists", params, HTTP_X_USER=self.ADMIN)
+
+    def test_finds_a_live_user_in_any_table(self):
+        for params in ({"email": "s@x.com"}, {"cnic": "111"}, {"phone": "0300"}, {"email": "new@x.com", "cnic": "111"}):
+            self.assertEqual(self.probe(params).json(), {"exists": True, "table": "student", "id": self.student.id}, params)
+
+    def test_deleted_and_unknown_values_are_free(self):
+        self.assertEqual(self.probe({"cnic": "222"}).json(), {"exists": False})
+        self.assertEqual(self.probe({"email": "new@x.com"}).json(), {"exists": False})
+
+    def test_exclude_skips_the_callers_own_row(self):
+        params = {"email": "s@x.com", "excludeTable": "student", "excludeId": self.student.id}
+        self.assertEqual(self.probe(params).json(), {"exists": False})
+        params["excludeTable"] = "teacher"
+        self.assertTrue(self.probe(params).json()["exists"])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.probe({}).status_code, 400)
+        self.assertEqual(self.probe({"email": "a", "excludeTable": "course", "excludeId": 1}).status_code, 400)
+        self.assertEqual(self.probe({"email": "a", "excludeTable": "student", "excludeId": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/exists", {"email": "a"}).status_code, 401)
+
+    def test_database_failure_is_a_generic_500(self):
+        with mock.patch.object(ExistsProbeView, "find_conflict", side_effect=Exception("secret details")), \
+                self.assertLogs("myproject", "ERROR") as logs:
+            response = self.probe({"email": "s@x.com"})
+        self.assertEqual(response.status_code, 500)
+        self.assertNotIn("secret", response.json()["error"])
+        self.assertIn("secret details", logs.output[0])
+
+
+class ResponseCacheTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Teacher.objects.create(name="t", email="t@x.com", password="h")
+        Course.objects.create(name="algebra", teacherId=cls.teacher)
+
+    def read(self, table, **params):
+        response = self.get_data({"tableName": table, **params})
+        self.assertEqual(response.status_code, 200)
+        return response["X-Cache"], response.json()
+
+    def test_repeat_read_is_a_hit_until_the_table_is_written(self):
+        self.assertEqual(self.read("teacher")[0], "MISS")
+        self.assertEqual(self.read("teacher")[0], "HIT")
+        Teacher.objects.filter(id=self.teacher.id).update(name="renamed")
+        # Without a bump the cached body is served
+        self.assertEqual(self.read("teacher")[1]["data"][0]["name"], "t")
+        bump_table_generation("teacher")
+        self.assertEqual(self.read("teacher"), ("MISS", {"data": [mock.ANY]}))
+        self.assertEqual(self.read("teacher")[1]["data"][0]["name"], "renamed")
+
+    def test_reads_through_a_table_follow_its_writes(self):
+        self.read("course")
+        bump_table_generation("teacher")
+        self.assertEqual(self.read("course")[0], "MISS")
+        bump_table_generation("enrollment")
+        self.assertEqual(self.read("course")[0], "HIT")
+
+    def test_key_covers_params_and_role(self):
+        self.read("teacher")
+        self.assertEqual(self.read("teacher", fields="id")[0], "MISS")
+        self.assertEqual(self.read("teacher", includePassword="true")[0], "MISS")
+        teacher_user = json.dumps({"id": 9, "type": "teacher"})
+        self.assertEqual(self.get_data({"tableName": "teacher"}, teacher_user)["X-Cache"], "MISS")
+
+    def test_flushed_counters_never_match_old_keys(self):
+        self.read("teacher")
+        caches["shared"].clear()
+        self.assertEqual(self.read("teacher")[0], "MISS")
+
+
+class ConditionalGetTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Teacher.objects.create(name="t", email="t@x.com", password="h")
+
+    def test_matching_etag_is_a_304_without_a_query(self):
+        first = self.get_data({"tableName": "teacher"})
+        etag = first["ETag"]
+        self.assertEqual(first["Cache-Control"], "private, no-cache")
+        with self.assertNumQueries(0):
+            response = self.get_data({"tableName": "teacher"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self.get_data({"tableName": "teacher"}, HTTP_IF_NONE_MATCH="*").status_code, 304)
+
+    def test_writes_and_other_params_change_the_etag(self):
+        etag = self.get_data({"tableName": "teacher"})["ETag"]
+        self.assertNotEqual(self.get_data({"tableName": "teacher", "fields": "id"})["ETag"], etag)
+        response = self.get_data({"tableName": "teacher"}, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        bump_table_generation("teacher")
+        response = self.get_data({"tableName": "teacher"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_read_service_client_revalidates_its_copy(self):
+        """portal_common.read_service.get_data against this service, through an httpx transport."""
+        statuses = []
+
+        async def handler(request):
+            headers = {
+                f"HTTP_{k.upper().replace('-', '_')}": v
+                for k, v in request.headers.items() if k.lower() in ("x-user", "if-none-match")
+            }
+            path = request.url.path.replace("/read", "", 1)
+            response = await sync_to_async(self.client.get)(path, dict(request.url.params), **headers)
+            statuses.append(response.status_code)
+            return httpx.Response(response.status_code, headers=dict(response.items()), content=response.content)
+
+        self.addCleanup(read_service._validators.clear)
+        headers = read_service.read_headers({"id": 1, "type": "admin"}, "token")
+
+        async def read(params):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await read_service.get_data(client, {"tableName": "teacher", **params}, headers)
+
+        rows = async_to_sync(read)({})
+        self.assertEqual(async_to_sync(read)({}), rows)
+        self.assertEqual(statuses, [200, 304])
+        # Rows with password hashes are never kept, so never revalidated
+        async_to_sync(read)({"includePassword": "true"})
+        async_to_sync(read)({"includePassword": "true"})
+        self.assertEqual(statuses[2:], [200, 200])
+
+
+class StreamingTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            Teacher.objects.create(name=f"t{i}", email=f"t{i}@x.com", password="h")
+
+    def setUp(self):
+        super().setUp()
+        # Several chunks per read, with a partial one at the end
+        patcher = mock.patch("readserv.mixins.StreamingMixin.STREAM_CHUNK_SIZE", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stream(self, response):
+        self.assertTrue(response.streaming)
+        self.assertNotIn("X-Cache", response)
+        return b"".join(response.streaming_content)
+
+    def test_ndjson_is_one_row_per_line(self):
+        expected = self.get_data({"tableName": "teacher"}).json()["data"]
+        response = self.get_data({"tableName": "teacher", "format": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = self.stream(response).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_json_stream_matches_a_normal_read(self):
+        for params in ({}, {"fields": "id,name"}, {"name": "nobody"}):
+            expected = self.get_data({"tableName": "teacher", **params}).json()
+            response = self.get_data({"tableName": "teacher", "format": "json-stream", **params})
+            self.assertEqual(json.loads(self.stream(response)), expected)
+
+    def test_async_view_streams_too(self):
+        async def read():
+            response = await self.async_client.get(
+                "/api/get-data-async", {"tableName": "teacher", "format": "ndjson"}, headers={"X-User": self.ADMIN}
+            )
+            return [line async for line in response.streaming_content]
+
+        body = b"".join(async_to_sync(read)())
+        self.assertEqual(len(body.splitlines()), 5)
+
+    def test_rejects_paging_and_unknown_formats(self):
+        self.assertEqual(self.get_data({"tableName": "teacher", "format": "ndjson", "limit": 2}).status_code, 400)
+        self.assertEqual(self.get_data({"tableName": "teacher", "format": "xml"}).status_code, 400)
+
+
+class ColumnsFormatTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teacher = Teacher.objects.create(name="t", email="t@x.com", password="h")
+        Course.objects.create(name="algebra", teacherId=teacher)
+        Course.objects.create(name="biology", teacherId=teacher)
+
+    def test_decodes_to_the_same_rows_as_a_normal_read(self):
+        for params in ({"tableName": "course"}, {"tableName": "teacher", "fields": "id,name", "limit": 1}):
+            expected = self.get_data(params).json()
+            payload = self.get_data({**params, "format": "columns"}).json()
+            self.assertEqual(read_service.decode_rows(payload), expected["data"])
+            self.assertEqual(payload.get("next"), expected.get("next"))
+        self.assertEqual(self.get_data({"tableName": "teacher", "fields": "name", "format": "columns"}).json(), {
+            "columns": ["name"], "rows": [["t"]],
+        })
+
+    def test_columns_cover_keys_missing_from_the_first_row(self):
+        rows = [
+            {"id": 1, "teacherId": None},
+            {"id": 2, "teacherId": 5, "teacherName": "T"},
+        ]
+        self.assertEqual(ProjectionMixin().to_columns(rows, ["id", "teacherId"]), {
+            "columns": ["id", "teacherId", "teacherName"],
+            "rows": [[1, None, None], [2, 5, "T"]],
+        })
+
+    def test_no_rows_keeps_the_projected_columns(self):
+        self.assertEqual(ProjectionMixin().to_columns([], ["id", "name"]), {"columns": ["id", "name"], "rows": []})
+
+
+class RendererTests(SimpleTestCase):
+    def test_orjson_output_matches_drf(self):
+        data = {
+            "when": datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+            "price": decimal.Decimal("9.50"),
+            "text": "line\u2028break \u00e9",
+            "rows": [{"id": 1, "ok": True, "none": None}],
+        }
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+        self.assertNotIn(b"\xe2\x80\xa8", dumps(data))
+        self.assertEqual(loads(dumps(data))["when"], "2024-05-01T12:30:00Z")
+
+
+class ExpandTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Teacher.objects.create(name="t", email="t@x.com", password="h")
+        cls.taught = Course.objects.create(name="algebra", teacherId=cls.teacher)
+        cls.untaught = Course.objects.create(name="biology")
+        cls.student = Student.objects.create(name="s", email="s@x.com", password="h")
+        for course in (cls.taught, cls.untaught):
+            Enrollment.objects.create(studentId=cls.student, courseId=course)
+
+    def rows(self, params, user=None):
+        response = self.get_data(params, user)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["data"]
+
+    def test_relations_nest_from_one_query(self):
+        with self.assertNumQueries(1):
+            rows = self.rows({"tableName": "enrollment", "expand": "course.teacher,student", "orderBy": "id"})
+        self.assertEqual(rows[0]["course"]["name"], "algebra")
+        self.assertEqual(rows[0]["course"]["teacher"], {"id": self.teacher.id, "name": "t", "email": "t@x.com"})
+        self.assertEqual(rows[0]["student"]["name"], "s")
+        self.assertNotIn("password", rows[0]["student"])
+        # A NULL FK nests as null
+        self.assertIsNone(rows[1]["course"]["teacher"])
+        self.assertEqual([row["teacher"] for row in self.rows({"tableName": "course", "expand": "teacher"})],
+                         [mock.ANY, None])
+
+    def test_expanded_tables_invalidate_the_cached_read(self):
+        params = {"tableName": "enrollment", "expand": "course.teacher"}
+        self.rows(params)
+        Teacher.objects.filter(id=self.teacher.id).update(name="renamed")
+        bump_table_generation("teacher")
+        self.assertEqual(self.rows(params)[0]["course"]["teacher"]["name"], "renamed")
+
+    def test_rejected_expansions(self):
+        student_user = json.dumps({"id": self.student.id, "type": "student"})
+        response = self.get_data({"tableName": "enrollment", "expand": "student"}, student_user)
+        self.assertEqual(response.status_code, 403)
+        for params in [
+            {"tableName": "enrollment", "expand": "nope"},
+            {"tableName": "student", "expand": "course"},
+            {"tableName": "enrollment", "expand": "course", "aggregate": "count:id"},
+        ]:
+            self.assertEqual(self.get_data(params).status_code, 400, params)
+
+
+HAS_REPLICA = "replica_1" in settings.DATABASES
+
+
+@skipUnless(HAS_REPLICA, "needs DB_ENGINE=sqlite READ_REPLICAS=<file>")
+class ReadReplicaRoutingTests(ReadServiceTestCase):
+    """
+    DB_ENGINE=sqlite READ_REPLICAS=replica.sqlite3 python manage.py test readserv
+
+    `default` and `replica_1` are separate SQLite test databases, and the course is named
+    after the one it was written to, so each response shows which database answered.
+    """
+    # The test runner sets up every class's databases, skipped or not
+    databases = {"default", "replica_1"} if HAS_REPLICA else {"default"}
+
+    @classmethod
+    def setUpTestData(cls):
+        for alias in cls.databases:
+            teacher = Teacher.objects.using(alias).create(name="t", email="t@x.com", password="h", cnic="1", phone="1")
+            Course.objects.using(alias).create(name=alias, teacherId=teacher, credit_hours=3)
+
+    def setUp(self):
+        super().setUp()
+        replica_health.healthy = ["replica_1"]
+
+    def answered_by(self, headers=None):
+        response = self.client.get("/api/get-data", {"tableName": "course"}, HTTP_X_USER=self.ADMIN, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.json()["data"]]
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.answered_by(), ["replica_1"])
+
+    def test_recent_write_header_pins_reads_to_the_primary(self):
+        self.assertEqual(self.answered_by({LAST_WRITE_HEADER: str(int(time.time() * 1000))}), ["default"])
+
+    def test_old_write_header_does_not_pin(self):
+        written = time.time() - settings.READ_REPLICA_PIN_SECONDS - 1
+        self.assertEqual(self.answered_by({LAST_WRITE_HEADER: str(int(written * 1000))}), ["replica_1"])
+
+    def test_shared_last_write_marker_pins_reads_to_the_primary(self):
+        caches["shared"].set(LAST_WRITE_KEY.format("admin", 1), int(time.time() * 1000))
+        self.assertEqual(self.answered_by(), ["default"])
+
+    def test_async_view_checks_the_marker_off_the_event_loop(self):
+        caches["shared"].set(LAST_WRITE_KEY.format("admin", 1), int(time.time() * 1000))
+        real_get = caches["shared"].get
+
+        def get(*args, **kwargs):
+            with self.assertRaises(RuntimeError):
+                asyncio.get_running_loop()
+            return real_get(*args, **kwargs)
+
+        async def read():
+            response = await self.async_client.get(
+                "/api/get-data-async", {"tableName": "course"}, headers={"X-User": self.ADMIN}
+            )
+            return [row["name"] for row in json.loads(response.content)["data"]]
+
+        with mock.patch.object(caches["shared"], "get", side_effect=get):
+            self.assertEqual(async_to_sync(read)(), ["default"])
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        self.assertTrue(replica_health.check("replica_1"))
+        with mock.patch.object(connections["replica_1"], "cursor", side_effect=Exception("down")), \
+                self.assertLogs("myproject", "WARNING"):
+            replica_health.healthy = [alias for alias in replica_aliases() if replica_health.check(alias)]
+        self.assertEqual(replica_health.healthy, [])
+        self.assertEqual(self.answered_by(), ["default"])
+
+
+class SearchTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        names = ["khalid", "muhammad ali", "alice", "ali", "bob"]
+        cls.ids = {name: Student.objects.create(name=name, email=f"s{i}@x.com", password="h").id
+                   for i, name in enumerate(names)}
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(search._indexes.clear)
+        # The background thread has its own connection, which can't see the test's rows
+        patcher = mock.patch.object(search.SearchIndex, "rebuild_in_background",
+                                    lambda index, generation: index.rebuild(generation))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, text, **params):
+        response = self.get_data({"tableName": "student", "search": text, "fields": "name", **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["name"] for row in response.json()["data"]]
+
+    def test_exact_then_prefix_then_word_then_substring(self):
+        self.assertEqual(self.search("ali"), ["ali", "alice", "muhammad ali", "khalid"])
+        self.assertEqual(self.search("ALI", limit=2), ["ali", "alice"])
+        self.assertEqual(self.search("al"), ["ali", "alice", "muhammad ali"])
+
+    def test_first_search_answers_from_the_database_while_the_index_builds(self):
+        with mock.patch.object(search.SearchIndex, "rebuild_in_background") as rebuild:
+            self.assertEqual(self.search("ali"), ["ali", "alice", "muhammad ali", "khalid"])
+            response = self.get_data({"tableName": "student", "search": "ali"})
+        rebuild.assert_called()
+        # Not cached: the next search after the build must come from the index
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertNotIn("ETag", response)
+
+    def test_writes_replay_only_the_changed_rows_outside_the_lock(self):
+        self.search("ali")
+        index = search._indexes["student"]
+        student = Student.objects.create(name="alison", email="new@x.com", password="h")
+        Student.objects.filter(id=self.ids["alice"]).update(name="zed")
+        bump_table_generation("student", [student.id, self.ids["alice"]])
+
+        load_rows = index.load_rows
+
+        def unlocked_load_rows(ids):
+            self.assertFalse(index.lock.locked())
+            return load_rows(ids)
+
+        with mock.patch.object(index, "load_rows", side_effect=unlocked_load_rows) as loaded, \
+                mock.patch.object(index, "build") as build:
+            self.assertEqual(self.search("ali"), ["ali", "alison", "muhammad ali", "khalid"])
+        loaded.assert_called_once_with({student.id, self.ids["alice"]})
+        build.assert_not_called()
+
+    def test_bad_searches(self):
+        for params in [
+            {"tableName": "enrollment", "search": "x"},
+            {"tableName": "student", "search": "  "},
+            {"tableName": "student", "search": "x", "orderBy": "id"},
+            {"tableName": "student", "search": "x", "limit": 500},
+        ]:
+            self.assertEqual(self.get_data(params).status_code, 400, params)
+
+
+class CountModeTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teacher = Teacher.objects.create(name="t", email="t@x.com", password="h")
+        course = Course.objects.create(name="algebra", teacherId=teacher)
+        cls.students = [Student.objects.create(name=f"s{i}", email=f"s{i}@x.com", password="h") for i in range(3)]
+        for student in cls.students:
+            Enrollment.objects.create(studentId=student, courseId=course)
+        cls.students[0].isDeleted = True
+        cls.students[0].save()
+
+    def test_count_and_exists_follow_filters(self):
+        self.assertEqual(self.get_data({"tableName": "student", "mode": "count"}).json(), {"count": 3, "estimated": False})
+        self.assertEqual(self.get_data({"tableName": "student", "mode": "count", "isDeleted": "false"}).json()["count"], 2)
+        self.assertEqual(self.get_data({"tableName": "student", "mode": "exists", "name": "s1"}).json(), {"exists": True})
+        self.assertEqual(self.get_data({"tableName": "student", "mode": "exists", "name": "x"}).json(), {"exists": False})
+        # Estimates fall back to an exact count off MySQL
+        response = self.get_data({"tableName": "student", "mode": "count", "estimate": "true"})
+        self.assertEqual(response.json(), {"count": 3, "estimated": False})
+
+    def test_counts_are_scoped_like_rows(self):
+        student = json.dumps({"id": self.students[1].id, "type": "student"})
+        response = self.get_data({"tableName": "enrollment", "mode": "count"}, student)
+        self.assertEqual(response.json()["count"], 1)
+
+    def test_total_count_header_ignores_the_page(self):
+        response = self.get_data({"tableName": "student", "limit": 1, "totalCount": "true"})
+        self.assertEqual(len(response.json()["data"]), 1)
+        self.assertEqual(response["X-Total-Count"], "3")
+        self.assertNotIn("X-Total-Count-Estimated", response)
+        # Cached with the body, and moved on with its generation
+        self.assertEqual(self.get_data({"tableName": "student", "limit": 1, "totalCount": "true"})["X-Total-Count"], "3")
+        Student.objects.create(name="s3", email="s3@x.com", password="h")
+        bump_table_generation("student")
+        self.assertEqual(self.get_data({"tableName": "student", "limit": 1, "totalCount": "true"})["X-Total-Count"], "4")
+
+    def test_invalid_combinations(self):
+        for params in [
+            {"tableName": "student", "mode": "rows2"},
+            {"tableName": "student", "mode": "count", "limit": 1},
+            {"tableName": "student", "mode": "count", "aggregate": "count:id"},
+            {"tableName": "student", "mode": "exists", "format": "ndjson"},
+            {"tableName": "student", "totalCount": "true", "mode": "count"},
+        ]:
+            self.assertEqual(self.get_data(params).status_code, 400, params)
+
+
+class TimingTests(ReadServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Teacher.objects.create(name="t", email="t@x.com", password="h")
+
+    def test_sampled_requests_get_a_server_timing_breakdown(self):
+        with override_settings(TIMING_SAMPLE_RATE=1), self.assertLogs("myproject.timing", "INFO") as logs:
+            response = self.get_data({"tableName": "teacher"})
+        metrics = {entry.split(";")[0] for entry in response["Server-Timing"].split(", ")}
+        self.assertLessEqual({"db", "serialize", "total"}, metrics)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record["path"], record["status"]), ("/api/get-data", 200))
+        self.assertGreaterEqual(record["db_count"], 1)
+
+    def test_unsampled_requests_are_left_alone(self):
+        with override_settings(TIMING_SAMPLE_RATE=0):
+            self.assertNotIn("Server-Timing", self.get_data({"tableName": "teacher"}))
+@override_settings(JWT_DENYLIST_POLL=0)
+class DenylistTests(SharedCacheMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.denylist = Denylist()
+        self.exp = time.time() + 1800
+        self.window = int(self.exp // REVOKED_WINDOW)
+        self.clock = 1000.0
+        patcher = mock.patch("portal_common.jwt_auth.time.monotonic", lambda: self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def revoke(self, number, jti, count=None):
+        shared = caches["shared"]
+        shared.set(REVOKED_COUNT_KEY.format(self.window), count or number)
+        if jti is not None:
+            shared.set(REVOKED_ENTRY_KEY.format(self.window, number), (jti, self.exp))
+
+    def test_revoked_jti_is_denied(self):
+        self.assertFalse(self.denylist.is_revoked("a", self.exp))
+        self.revoke(1, "a")
+        self.revoke(2, "b")
+        self.assertTrue(self.denylist.is_revoked("a", self.exp))
+        self.assertTrue(self.denylist.is_revoked("b", self.exp))
+        self.assertFalse(self.denylist.is_revoked("c", self.exp))
+
+    def test_entry_written_late_is_picked_up(self):
+        self.revoke(1, None)
+        self.assertFalse(self.denylist.is_revoked("a", self.exp))
+        self.clock += ENTRY_WRITE_GRACE - 1
+        self.revoke(1, "a")
+        self.assertTrue(self.denylist.is_revoked("a", self.exp))
+        self.assertFalse(self.denylist.is_revoked("other", self.exp))
+
+    def test_lost_entry_rejects_its_whole_window(self):
+        self.revoke(2, "b")  # entry 1 never shows up
+        self.assertFalse(self.denylist.is_revoked("other", self.exp))
+        self.clock += ENTRY_WRITE_GRACE
+        with self.assertLogs("myproject", "ERROR"):
+            self.assertTrue(self.denylist.is_revoked("other", self.exp))
+        # Tokens expiring in another window are unaffected
+        self.assertFalse(self.denylist.is_revoked("other", self.exp + REVOKED_WINDOW))
+
+    def test_count_going_back_rejects_its_whole_window(self):
+        self.revoke(1, "a")
+        self.revoke(2, "b")
+        self.assertFalse(self.denylist.is_revoked("other", self.exp))
+        caches["shared"].clear()
+        self.revoke(1, "c")
+        with self.assertLogs("myproject", "ERROR"):
+            self.assertTrue(self.denylist.is_revoked("other", self.exp))
+
+
+class JWTAuthMiddlewareTests(ReadServiceTestCase):
+    """Bearer tokens checked here instead of trusting X-User from the gateway."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        cls.public_pem = cls.key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+        ).decode()
+
+    @classmethod
+    def setUpTestData(cls):
+        Teacher.objects.create(name="t0", email="t0@x.com", password="h")
+
+    def setUp(self):
+        super().setUp()
+        override = override_settings(JWT_PUBLIC_KEY=self.public_pem, JWT_DENYLIST_POLL=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        patcher = mock.patch.object(jwt_auth, "denylist", Denylist())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def token(self, **claims):
+        claims = {"id": 1, "name": "a", "email": "a@x.com", "type": "admin",
+                  "exp": int(time.time()) + 600, "jti": uuid.uuid4().hex, **claims}
+        return claims, jwt.encode(claims, self.key, algorithm="RS256")
+
+    def test_claims_replace_the_x_user_header(self):
+        claims, token = self.token()
+        # A forged X-User is ignored in favour of the token
+        request = RequestFactory().get("/api/get-data", HTTP_X_USER=json.dumps({"id": 9, "type": "admin"}),
+                                       HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertIsNone(jwt_auth.authenticate(request))
+        self.assertEqual(json.loads(request.headers["X-User"]), {k: claims[k] for k in jwt_auth.USER_CLAIMS})
+        response = self.get_data({"tableName": "teacher"}, HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_forged_expired_and_revoked_tokens_are_refused(self):
+        claims, revoked = self.token()
+        shared = caches["shared"]
+        window = int(claims["exp"] // REVOKED_WINDOW)
+        shared.set(REVOKED_COUNT_KEY.format(window), 1)
+        shared.set(REVOKED_ENTRY_KEY.format(window, 1), (claims["jti"], claims["exp"]))
+        forged = jwt.encode({"id": 1, "type": "admin", "exp": int(time.time()) + 600, "jti": "x"}, "secret")
+        for auth in ({}, {"HTTP_AUTHORIZATION": f"Bearer {forged}"},
+                     {"HTTP_AUTHORIZATION": f"Bearer {self.token(exp=int(time.time()) - 1)[1]}"},
+                     {"HTTP_AUTHORIZATION": f"Bearer {revoked}"}):
+            self.assertEqual(self.get_data({"tableName": "teacher"}, **auth).status_code, 401, auth)
+
+    async def test_async_check_runs_off_the_event_loop(self):
+        verify = jwt_auth.verify_token
+        def verify_token(token):
+            with self.assertRaises(RuntimeError):
+                asyncio.get_running_loop()
+            return verify(token)
+        _, token = self.token()
+        with mock.patch.object(jwt_auth, "verify_token", verify_token):
+            response = await self.async_client.get(
+                "/api/get-data-async", {"tableName": "teacher"}, headers={"Authorization": f"Bearer {token}"},
+            )
+        self.assertEqual(response.status_code, 200)
+
+
+class GCRATests(SimpleTestCase):
+    # 5 requests per 60 s: one every 12 s, bursts of up to 5
+    INTERVAL, PERIOD = 12.0, 60.0
+
+    def test_burst_then_one_per_interval(self):
+        tat, now = None, 1000.0
+        for _ in range(5):
+            allowed, tat, retry_after = gcra(tat, now, self.INTERVAL, self.PERIOD)
+            self.assertTrue(allowed)
+        allowed, tat, retry_after = gcra(tat, now, self.INTERVAL, self.PERIOD)
+        self.assertFalse(allowed)
+        self.assertEqual(retry_after, self.INTERVAL)
+        # A denied request doesn't push the schedule back
+        self.assertEqual(tat, now + 5 * self.INTERVAL)
+        self.assertTrue(gcra(tat, now + self.INTERVAL, self.INTERVAL, self.PERIOD)[0])
+
+    def test_idle_key_starts_with_a_full_burst(self):
+        tat = 1000.0 + 5 * self.INTERVAL
+        now = tat + 3600
+        for _ in range(5):
+            allowed, tat, _ = gcra(tat, now, self.INTERVAL, self.PERIOD)
+            self.assertTrue(allowed)
+        self.assertFalse(gcra(tat, now, self.INTERVAL, self.PERIOD)[0])
+
+    def test_local_backend_counts_keys_apart(self):
+        backend = LocalBackend()
+        results = [backend.hit("a", self.INTERVAL, self.PERIOD)[0] for _ in range(6)]
+        self.assertEqual(results, [True] * 5 + [False])
+        self.assertTrue(backend.hit("b", self.INTERVAL, self.PERIOD)[0])
+
+
+def hit_shared_memory(path, slots, key, times, allowed):
+    backend = SharedMemoryBackend(path, slots)
+    for _ in range(times):
+        if backend.hit(key, 1.0, 20.0)[0]:
+            with allowed.get_lock():
+                allowed.value += 1
+
+
+@skipUnless(fcntl, "the shm backend needs fcntl (POSIX)")
+class SharedMemoryBackendTests(SimpleTestCase):
+    SLOTS = SharedMemoryBackend.PROBES  # so every probe sequence covers the whole table
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.path = os.path.join(directory, "ratelimit")
+        self.now = 1000.0
+        patcher = mock.patch("time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def backend(self):
+        backend = SharedMemoryBackend(self.path, self.SLOTS)
+        self.addCleanup(os.close, backend.fd)
+        self.addCleanup(backend.map.close)
+        return backend
+
+    def colliding_keys(self, backend, count):
+        """Keys sharing one home slot, so all but the first are placed by probing."""
+        keys, home = [], None
+        for i in range(10_000):
+            slot = backend.key_hash(f"k{i}") % self.SLOTS
+            if home is None:
+                home = slot
+            if slot == home:
+                keys.append(f"k{i}")
+                if len(keys) == count:
+                    return keys
+        self.fail("no colliding keys found")
+
+    def test_state_is_shared_through_the_file(self):
+        first, second = self.backend(), self.backend()
+        self.assertTrue(first.hit("a", 10.0, 20.0)[0])
+        self.assertTrue(second.hit("a", 10.0, 20.0)[0])
+        allowed, retry_after = first.hit("a", 10.0, 20.0)
+        self.assertFalse(allowed)
+        self.assertEqual(retry_after, 10.0)
+
+    def test_colliding_keys_keep_their_own_state(self):
+        backend = self.backend()
+        a, b = self.colliding_keys(backend, 2)
+        self.assertTrue(backend.hit(a, 10.0, 10.0)[0])
+        self.assertFalse(backend.hit(a, 10.0, 10.0)[0])
+        self.assertTrue(backend.hit(b, 10.0, 10.0)[0])
+        self.assertFalse(backend.hit(b, 10.0, 10.0)[0])
+
+    def test_expired_slot_is_reused_before_a_live_one(self):
+        backend = self.backend()
+        keys = self.colliding_keys(backend, self.SLOTS + 1)
+        for i, key in enumerate(keys[:self.SLOTS]):
+            # keys[0] expires first, the others stay live
+            backend.hit(key, 1.0 if i == 0 else 100.0, 100.0)
+        self.now += 2
+        backend.hit(keys[-1], 100.0, 100.0)
+        for key in keys[1:self.SLOTS]:
+            self.assertFalse(backend.hit(key, 100.0, 100.0)[0], key)
+
+    def test_full_table_evicts_the_key_closest_to_expiry(self):
+        backend = self.backend()
+        keys = self.colliding_keys(backend, self.SLOTS + 1)
+        # One request per interval, no burst: a key's second hit is only allowed if it was evicted
+        for i, key in enumerate(keys[:self.SLOTS]):
+            backend.hit(key, 50.0 + i, 50.0 + i)
+        backend.hit(keys[-1], 100.0, 100.0)
+        # keys[0] had the earliest TAT: it lost its slot and starts over
+        self.assertFalse(backend.hit(keys[1], 51.0, 51.0)[0])
+        self.assertFalse(backend.hit(keys[-1], 100.0, 100.0)[0])
+        self.assertTrue(backend.hit(keys[0], 50.0, 50.0)[0])
+
+    def test_processes_share_one_limit(self):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            self.skipTest("needs fork")
+        context = multiprocessing.get_context("fork")
+        allowed = context.Value("i", 0)
+        workers = [
+            context.Process(target=hit_shared_memory, args=(self.path, 64, "shared", 15, allowed))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # 1 per second, bursts of 20; the clock is frozen, so exactly the burst gets through
+        self.assertEqual(allowed.value, 20)
@@ -2,8 +2,29 @@ import json
 from rest_framework.throttling import SimpleRateThrottle
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import Throttled
+from portal_common.renderers import loads
+from portal_common.ratelimit import rate_limiter
 
-class XUserRateThrottle(SimpleRateThrottle):
+class GCRARateThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle's rates, scopes and cache keys, counted by portal_common/ratelimit.py
+    (one number per key, updated atomically) instead of a cached list of timestamps.
+    """
+    retry_after = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self.retry_after = rate_limiter().hit(self.key, self.duration / self.num_requests, self.duration)
+        return allowed or self.throttle_failure()
+
+    def wait(self):
+        return self.retry_after
+
+class XUserRateThrottle(GCRARateThrottle):
     scope = "xuser"
     # Custom error message
 
@@ -28,7 +49,7 @@ class XUserRateThrottle(SimpleRateThrottle):
             return None 
 
         try:
-            user_data = json.loads(user_header)
+            user_data = loads(user_header)
         except json.JSONDecodeError:
             return None
 
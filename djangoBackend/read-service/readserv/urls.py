@@ -1,8 +1,14 @@
 # readserv/urls.py
 from django.urls import path
-from .views import GenericReadView
+from .views import GenericReadView, AsyncReadView, BatchReadView, ExistsProbeView
 
 urlpatterns = [
     # Map the URL to the single GenericReadView
     path('get-data', GenericReadView.as_view(), name='generic_read'),
+    # Native async variant, meant to be served under ASGI
+    path('get-data-async', AsyncReadView.as_view(), name='generic_read_async'),
+    # Several table queries in one round trip
+    path('get-batch', BatchReadView.as_view(), name='batch_read'),
+    # Cross-role uniqueness probe for email / CNIC / phone
+    path('exists', ExistsProbeView.as_view(), name='exists_probe'),
 ]
\ No newline at end of file
@@ -1,18 +1,315 @@
+from django.apps import apps
+from django.conf import settings
+from django.db import router
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.views import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from asgiref.sync import async_to_sync
-from asgiref.sync import sync_to_async
+from rest_framework.exceptions import Throttled
+from asgiref.sync import async_to_sync, sync_to_async
+import asyncio
 import logging
 
+from portal_common.renderers import ORJSONRenderer
+from portal_common.timing import timed
+
+from .cache import table_generations, generations_settled, response_cache_key, get_cached_response, cache_response
 from .config import TABLE_ACCESS
-from .mixins import HeaderUserMixin, RBACMixin, QueryMixin, SerializerMixin
+from .exceptions import ReadRequestError
+from .search import search_index
+from .mixins import (
+    HeaderUserMixin, RBACMixin, FilterMixin, QueryMixin, PaginationMixin, ProjectionMixin, SerializerMixin,
+    AggregationMixin, ExistsProbeMixin, StreamingMixin, ExpansionMixin, SearchMixin, CountMixin,
+)
 from .throttles import XUserRateThrottle
 
 logger = logging.getLogger("myproject")
 
 
-class GenericReadView(APIView, HeaderUserMixin, RBACMixin, QueryMixin, SerializerMixin):
+class ReadPipeline(
+    HeaderUserMixin, RBACMixin, FilterMixin, QueryMixin, PaginationMixin, ProjectionMixin, SerializerMixin,
+    AggregationMixin, StreamingMixin, ExpansionMixin, SearchMixin, CountMixin,
+):
+    """
+    The get-data read pipeline shared by the DRF view and the native async view.
+    Every step is a coroutine; ORM access goes through Django's async queryset iteration.
+    """
+
+    TABLE_ACCESS = TABLE_ACCESS
+    FORMATS = ('json', 'columns', 'ndjson', 'json-stream')
+    renderer = ORJSONRenderer()
+
+    def authenticate(self, request):
+        user = self.get_user_from_header(request)
+        if not user or 'id' not in user or 'type' not in user:
+            raise ReadRequestError("Unauthorized or invalid X-User header", status.HTTP_401_UNAUTHORIZED)
+        return user
+
+    def encoded_response(self, body, etag, hit, total=None):
+        if body is None:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type=self.renderer.media_type, status=status.HTTP_200_OK)
+            response['X-Cache'] = 'HIT' if hit else 'MISS'
+        if total is not None:
+            count, estimated = total
+            response['X-Total-Count'] = str(count)
+            if estimated:
+                response['X-Total-Count-Estimated'] = 'true'
+        if etag:
+            response['ETag'] = etag
+            # Clients may keep the body but must revalidate it (If-None-Match) before reuse
+            response['Cache-Control'] = 'private, no-cache'
+        else:
+            response['Cache-Control'] = 'no-store'
+        return response
+
+    async def read(self, user, source):
+        return await self.execute_read(await self.plan_read(user, source))
+
+    def stream_response(self, plan, asynchronous=False):
+        """Streams the rows of a plan in its ndjson / json-stream format (never cached)."""
+        config, fields = plan['config'], plan['fields']
+        queryset = self.build_queryset(config['model_name'], plan['filters'], config.get('post_process'), plan['user'])
+        # Rows are pulled after the view returns, so the database chosen at plan time is fixed here
+        queryset = queryset.using(plan['db'])
+        if plan['use_projection']:
+            queryset = self.project_queryset(queryset, fields, extra=self.expand_columns(plan['expand'], config))
+            serialize = lambda rows: self.project_rows(rows, plan)
+        else:
+            serialize = lambda rows: self.serialize_queryset(rows, config['model_name'], plan['select_fields'], plan['include_password'])
+
+        stream = self.astream_chunks if asynchronous else self.stream_chunks
+        return StreamingHttpResponse(
+            stream(queryset, serialize, plan['format']),
+            content_type=self.STREAM_CONTENT_TYPES[plan['format']],
+        )
+
+    async def read_encoded(self, plan, if_none_match=None):
+        """
+        Returns (body, etag, hit, total): the get-data payload as already-encoded JSON bytes,
+        plus (count, estimated) for X-Total-Count when the plan asks for it.
+        Bodies are cached per table generation, so a hit skips the ORM and the renderer;
+        any write to the table (or a table it reads through) moves the key on.
+
+        The ETag is derived from the same key, so a matching If-None-Match returns
+        body=None (304) before any query runs.
+
+        A replica read right after a write may predate it, so until the generations have
+        settled for READ_REPLICA_MAX_LAG such bodies are neither cached nor given an ETag.
+        """
+        # Generations come from the shared (file/network) cache: off the event loop
+        key, generations = await sync_to_async(self.cache_key, thread_sensitive=False)(plan)
+        cacheable = plan['db'] == 'default' or generations_settled(generations, settings.READ_REPLICA_MAX_LAG)
+        etag = self.etag_for(key) if cacheable else None
+        if etag and if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            return None, etag, True, None
+
+        total = await self.total_count(plan, key, cacheable) if plan['total_count'] else None
+        body = get_cached_response(key)
+        if body is not None:
+            return body, self.etag_for(key), True, total
+        body = self.renderer.render(await self.execute_read(plan))
+        # Likewise a search answered while its index is still catching up with the generation
+        if plan['search'] and search_index(plan['table'], plan['config']).generation != generations[plan['table']]:
+            cacheable, etag = False, None
+        if cacheable:
+            cache_response(key, body)
+        return body, etag, False, total
+
+    async def total_count(self, plan, key, cacheable):
+        """(count, estimated) of every row the plan's filters match, ignoring the page."""
+        total = get_cached_response(f'{key}:total')
+        if total is None:
+            config = plan['config']
+            queryset = self.build_queryset(config['model_name'], plan['filters'], None, plan['user']).using(plan['db'])
+            try:
+                total = await self.count_rows(queryset, plan['estimate'])
+            except Exception as e:
+                logger.error(f"Total count failed: {e}", exc_info=True)
+                raise ReadRequestError(str(e))
+            if cacheable:
+                cache_response(f'{key}:total', total)
+        return total
+
+    @staticmethod
+    def etag_for(key):
+        return f'"{key.rpartition(":")[2][:32]}"'
+
+    def cache_key(self, plan):
+        config = plan['config']
+        tables = [plan['table'], *config.get('depends_on', []), *(config['expand'][n]['table'] for n in plan['expand'])]
+        generations = table_generations(list(dict.fromkeys(tables)))
+        key = response_cache_key(
+            plan['table'], generations, plan['filters'], plan['user'].get('type'), plan['fields'],
+            plan['include_password'], plan['page'], plan['aggregate_spec'], plan['format'], plan['expand'],
+            plan['search'], plan['mode'], plan['estimate'],
+        )
+        return key, generations
+
+    async def plan_read(self, user, source):
+        """Validates the request params into a read plan; runs the pre_process hook but no query."""
+        table_name = source.pop('tableName', None)
+        if not table_name:
+            raise ReadRequestError("Missing tableName")
+
+        # RBAC check
+        config, error = self.check_access(table_name, user)
+        if error:
+            raise ReadRequestError(error, status.HTTP_403_FORBIDDEN if error == "Access denied" else status.HTTP_400_BAD_REQUEST)
+
+        # Aggregate mode (sum/count/... computed by the database)
+        aggregate_spec = [source.get('aggregate'), source.get('groupBy')]
+        try:
+            aggregate = self.parse_aggregate(source, config)
+        except ValueError as e:
+            raise ReadRequestError(str(e))
+
+        # Cardinality modes (mode=count|exists) and X-Total-Count for row reads
+        try:
+            mode, total_count, estimate = self.parse_count(source)
+        except ValueError as e:
+            raise ReadRequestError(str(e))
+        if mode != 'rows' and aggregate:
+            raise ReadRequestError(f"mode={mode} cannot be combined with aggregate")
+        if total_count and (mode != 'rows' or aggregate):
+            raise ReadRequestError("totalCount only applies to row reads")
+
+        # Search mode (ranked top-K from the search index); takes `limit` before pagination can
+        try:
+            search = self.parse_search(source, config)
+        except ValueError as e:
+            raise ReadRequestError(str(e))
+        if search and (aggregate or mode != 'rows' or total_count):
+            raise ReadRequestError("search cannot be combined with aggregate, mode or totalCount")
+
+        # Pagination / ordering params (keyset cursor)
+        try:
+            page = None if aggregate or search else self.parse_pagination(source, config)
+        except ValueError as e:
+            raise ReadRequestError(str(e))
+        if page and mode != 'rows':
+            raise ReadRequestError(f"mode={mode} cannot be paged or ordered")
+
+        # Output format: the streamed formats skip the response cache and only stream plain rows
+        fmt = source.pop('format', 'json')
+        if fmt not in self.FORMATS:
+            raise ReadRequestError(f"Unknown format '{fmt}'")
+        if fmt in self.STREAM_CONTENT_TYPES and (aggregate or page or search or mode != 'rows' or total_count):
+            raise ReadRequestError(f"format={fmt} cannot be combined with aggregate, pagination, search or counts")
+
+        # Filters & password handling
+        include_password = source.pop('includePassword', 'false').lower() in ['true', '1']
+        select_fields = list(config['select_fields'])
+        if not include_password and 'password' in select_fields:
+            select_fields.remove('password')
+
+        # Column projection: an explicit `fields=` subset always takes the fast path
+        requested_fields = source.pop('fields', None)
+        try:
+            fields = self.resolve_fields(requested_fields, select_fields)
+        except ValueError as e:
+            raise ReadRequestError(str(e))
+
+        # Relation expansion (expand=course,course.teacher) is JOINed into the projected query
+        try:
+            expand = self.parse_expand(source, config, user)
+        except PermissionError as e:
+            raise ReadRequestError(str(e), status.HTTP_403_FORBIDDEN)
+        except ValueError as e:
+            raise ReadRequestError(str(e))
+        if expand and (aggregate or mode != 'rows'):
+            raise ReadRequestError("expand cannot be combined with aggregate or mode")
+        use_projection = config.get('projection', False) or requested_fields is not None or bool(expand)
+
+        # Typed filter grammar (__in, range, prefix, isnull) checked against `filter_ops`
+        try:
+            filters = self.parse_filters(source, config, apps.get_model('readserv', config['model_name']))
+            filters = await self.apply_pre_process(filters, config.get('pre_process'), user)
+        except Exception as e:
+            raise ReadRequestError(str(e))
+
+        # Replica or primary, decided once (pinned after the caller's own writes, see routers.py)
+        db = router.db_for_read(apps.get_model('readserv', config['model_name']))
+
+        return {
+            'table': table_name.lower().strip(), 'config': config, 'user': user, 'filters': filters, 'db': db,
+            'aggregate': aggregate, 'aggregate_spec': aggregate_spec, 'page': page,
+            'include_password': include_password, 'select_fields': select_fields,
+            'fields': fields, 'use_projection': use_projection, 'format': fmt, 'expand': expand,
+            'search': search, 'mode': mode, 'total_count': total_count, 'estimate': estimate,
+        }
+
+    def project_rows(self, rows, plan):
+        """Nests expanded relations and drops the helper columns from values() rows."""
+        if plan['expand']:
+            rows = self.nest_expansions(rows, plan['expand'], plan['config'])
+        return self.strip_projection_keys(rows, [*plan['fields'], *self.expand_keys(plan['expand'])])
+
+    async def execute_read(self, plan):
+        config, page, fields, search = plan['config'], plan['page'], plan['fields'], plan['search']
+        use_projection = plan['use_projection']
+
+        # Query execution
+        try:
+            queryset = self.build_queryset(config['model_name'], plan['filters'], config.get('post_process'), plan['user'])
+            queryset = queryset.using(plan['db'])
+            if plan['mode'] == 'count':
+                count, estimated = await self.count_rows(queryset, plan['estimate'])
+                return {"count": count, "estimated": estimated}
+            if plan['mode'] == 'exists':
+                return {"exists": await queryset.aexists()}
+            if search:
+                ids = await self.search_ids(plan['table'], config, search, filtered=bool(plan['filters']))
+                queryset = queryset.filter(pk__in=ids)
+            if plan['aggregate']:
+                data = await self.run_aggregate(queryset, *plan['aggregate'])
+                # Grouped results are row lists and can go columnar; a single total stays an object
+                if plan['format'] == 'columns' and isinstance(data, list):
+                    expressions, group_by = plan['aggregate']
+                    return self.to_columns(data, [*group_by, *expressions])
+                return {"data": data}
+            if use_projection:
+                extra = self.expand_columns(plan['expand'], config)
+                # Search results are re-ranked by id
+                if search and 'id' not in fields:
+                    extra.append('id')
+                queryset = self.project_queryset(queryset, fields, page, extra)
+            if page:
+                queryset = self.paginate_queryset(queryset, page)
+            rows = [row async for row in queryset]
+            if search:
+                rows = self.rank_rows(rows, ids, search['limit'])
+        except Exception as e:
+            logger.error(f"Query failed: {e}", exc_info=True)
+            raise ReadRequestError(str(e))
+
+        # Serialization
+        next_cursor = None
+        try:
+            with timed('serialize'):
+                if page:
+                    rows, next_cursor = self.split_page(rows, page)
+                if use_projection:
+                    data = self.project_rows(rows, plan)
+                else:
+                    data = self.serialize_queryset(rows, config['model_name'], plan['select_fields'], plan['include_password'])
+        except Exception as e:
+            logger.error(f"Serialization failed: {e}", exc_info=True)
+            raise ReadRequestError(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if plan['format'] == 'columns':
+            payload = self.to_columns(data, [*fields, *self.expand_keys(plan['expand'])])
+        else:
+            payload = {"data": data}
+        if page:
+            payload["next"] = next_cursor
+        return payload
+
+
+class GenericReadView(APIView, ReadPipeline):
     """
     Generic API View to handle dynamic table read requests with RBAC using mixins.
     """
@@ -20,49 +317,186 @@ class GenericReadView(APIView, HeaderUserMixin, RBACMixin, QueryMixin, Serialize
     permission_classes = []
     throttle_classes = [XUserRateThrottle]
 
+    def get(self, request, *args, **kwargs):
+        try:
+            user = self.authenticate(request)
+            plan = async_to_sync(self.plan_read)(user, request.query_params.dict())
+            if plan['format'] in self.STREAM_CONTENT_TYPES:
+                return self.stream_response(plan)
+            body, etag, hit, total = async_to_sync(self.read_encoded)(plan, request.headers.get('If-None-Match'))
+        except ReadRequestError as e:
+            return Response({"error": str(e)}, status=e.status)
+
+        return self.encoded_response(body, etag, hit, total)
+
+
+class AsyncReadView(View, ReadPipeline):
+    """
+    Native async variant of get-data. Under ASGI the whole request (throttle, hooks,
+    query, projection) runs on the event loop without blocking a worker thread; the
+    blocking throttle and shared-cache calls are handed to a thread.
+    """
+    throttle_classes = [XUserRateThrottle]
+
+    def check_throttles(self, request):
+        """DRF throttles don't run outside APIView, so apply them by hand."""
+        for throttle_class in self.throttle_classes:
+            try:
+                if throttle_class().allow_request(request, self):
+                    continue
+                raise Throttled()
+            except Throttled as e:
+                headers = {'Retry-After': str(int(e.wait))} if e.wait else None
+                return JsonResponse({"detail": str(e.detail)}, status=e.status_code, headers=headers)
+        return None
+
+    async def get(self, request, *args, **kwargs):
+        throttled = await sync_to_async(self.check_throttles, thread_sensitive=False)(request)
+        if throttled:
+            return throttled
+
+        try:
+            user = self.authenticate(request)
+            plan = await self.plan_read(user, request.GET.dict())
+            if plan['format'] in self.STREAM_CONTENT_TYPES:
+                return self.stream_response(plan, asynchronous=True)
+            body, etag, hit, total = await self.read_encoded(plan, request.headers.get('If-None-Match'))
+        except ReadRequestError as e:
+            return JsonResponse({"error": str(e)}, status=e.status)
+
+        return self.encoded_response(body, etag, hit, total)
+
+
+class BatchReadView(APIView, ReadPipeline):
+    """
+    POST get-batch: runs several get-data sub-queries concurrently in one round trip.
+
+        {"queries": [{"key": "teachers", "tableName": "teacher", "filters": {"email": "a@b.com"}, "fields": ["id"]}, ...]}
+
+    Responds with {"data": {key: <get-data payload>}}. A sub-query's key defaults to its tableName.
+    """
+    authentication_classes = []
+    permission_classes = []
+    throttle_classes = [XUserRateThrottle]
+
+    MAX_QUERIES = 20
+    PASSTHROUGH_PARAMS = ('limit', 'after', 'orderBy', 'includePassword', 'aggregate', 'groupBy', 'format', 'expand', 'search', 'mode', 'estimate')
+
+    def post(self, request, *args, **kwargs):
+        try:
+            user = self.authenticate(request)
+            queries = self.parse_batch(request.data)
+            # One RBAC pass over every table before any query runs
+            for key, params in queries.items():
+                _, error = self.check_access(params['tableName'], user)
+                if error:
+                    raise ReadRequestError(f"{key}: {error}", status.HTTP_403_FORBIDDEN if error == "Access denied" else status.HTTP_400_BAD_REQUEST)
+            data = async_to_sync(self.read_many)(user, queries)
+        except ReadRequestError as e:
+            return Response({"error": str(e)}, status=e.status)
+
+        return Response({"data": data}, status=status.HTTP_200_OK)
+
+    async def read_many(self, user, queries):
+        results = await asyncio.gather(
+            *(self.read(user, params) for params in queries.values()),
+            return_exceptions=True
+        )
+        data = {}
+        for key, result in zip(queries, results):
+            if isinstance(result, ReadRequestError):
+                raise ReadRequestError(f"{key}: {result}", result.status)
+            if isinstance(result, Exception):
+                raise result
+            data[key] = result
+        return data
+
+    def parse_batch(self, body):
+        """Turns the JSON sub-queries into the same flat string params get-data receives."""
+        queries = body.get('queries') if isinstance(body, dict) else None
+        if not isinstance(queries, list) or not queries:
+            raise ReadRequestError("queries must be a non-empty list")
+        if len(queries) > self.MAX_QUERIES:
+            raise ReadRequestError(f"At most {self.MAX_QUERIES} queries per batch")
+
+        parsed = {}
+        for query in queries:
+            if not isinstance(query, dict) or not query.get('tableName'):
+                raise ReadRequestError("Every query needs a tableName")
+            key = str(query.get('key') or query['tableName'])
+            if key in parsed:
+                raise ReadRequestError(f"Duplicate query key '{key}'")
+
+            filters = query.get('filters') or {}
+            if not isinstance(filters, dict):
+                raise ReadRequestError(f"{key}: filters must be an object")
+
+            if query.get('format') in self.STREAM_CONTENT_TYPES:
+                raise ReadRequestError(f"{key}: format={query['format']} is not available in a batch")
+
+            params = {k: self.to_param(v) for k, v in filters.items()}
+            params['tableName'] = query['tableName']
+            if query.get('fields'):
+                params['fields'] = self.to_param(query['fields'])
+            for name in self.PASSTHROUGH_PARAMS:
+                if query.get(name) is not None:
+                    params[name] = self.to_param(query[name])
+            parsed[key] = params
+        return parsed
+
+    @staticmethod
+    def to_param(value):
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, (list, tuple)):
+            return ','.join(str(v) for v in value)
+        return str(value)
+
+
+class ExistsProbeView(APIView, HeaderUserMixin, RBACMixin, ExistsProbeMixin):
+    """
+    GET exists?email=..&cnic=..&phone=..[&excludeTable=student&excludeId=3]
+
+    Cross-role uniqueness probe. Returns {"exists": false} or {"exists": true, "table": .., "id": ..};
+    excludeTable/excludeId skip the caller's own row on updates.
+    """
+    authentication_classes = []
+    permission_classes = []
+    throttle_classes = [XUserRateThrottle]
+
     TABLE_ACCESS = TABLE_ACCESS
 
     def get(self, request, *args, **kwargs):
-        async def async_get_logic():
-            
-            # Extract user
-            user = self.get_user_from_header(request)
-            if not user or 'id' not in user or 'type' not in user:
-                return Response({"error": "Unauthorized or invalid X-User header"}, status=status.HTTP_401_UNAUTHORIZED)
-
-            user_id = user.get('id')
-            source = request.query_params.dict()
-            table_name = source.pop('tableName', None)
-
-            if not table_name:
-                return Response({"error": "Missing tableName"}, status=status.HTTP_400_BAD_REQUEST)
-
-            # RBAC check
-            config, error = self.check_access(table_name, user)
-            if error:
-                return Response({"error": error}, status=status.HTTP_403_FORBIDDEN if error == "Access denied" else status.HTTP_400_BAD_REQUEST)
+        user = self.get_user_from_header(request)
+        if not user or 'id' not in user or 'type' not in user:
+            return Response({"error": "Unauthorized or invalid X-User header"}, status=status.HTTP_401_UNAUTHORIZED)
 
-            # Filters & password handling
-            filters = {k: v for k, v in source.items() if k not in ['includePassword']}
-            include_password = source.get('includePassword', 'false').lower() in ['true', '1']
-            select_fields = list(config['select_fields'])
-            if not include_password and 'password' in select_fields:
-                select_fields.remove('password')
+        for table in self.PROBE_TABLES:
+            _, error = self.check_access(table, user)
+            if error:
+                return Response({"error": error}, status=status.HTTP_403_FORBIDDEN)
 
-            # Query execution
-            try:
-                queryset = await self.get_queryset(config['model_name'], filters, config.get('pre_process'), config.get('post_process'), user)
-            except Exception as e:
-                logger.error(f"Query failed: {e}", exc_info=True)
-                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        params = request.query_params
+        keys = {k: params[k] for k in self.PROBE_KEYS if params.get(k)}
+        if not keys:
+            return Response({"error": "Provide at least one of email, cnic, phone"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Serialization
-            try:
-                data = await sync_to_async(self.serialize_queryset)(queryset, config['model_name'], select_fields)
-            except Exception as e:
-                logger.error(f"Serialization failed: {e}", exc_info=True)
-                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        exclude_table = params.get('excludeTable')
+        exclude_id = params.get('excludeId')
+        if exclude_table and exclude_table not in self.PROBE_TABLES:
+            return Response({"error": f"Invalid excludeTable '{exclude_table}'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            exclude_id = int(exclude_id) if exclude_id else None
+        except ValueError:
+            return Response({"error": "excludeId must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response({"data": data}, status=status.HTTP_200_OK)
+        try:
+            conflict = self.find_conflict(keys, exclude_table, exclude_id)
+        except Exception as e:
+            logger.error(f"Exists probe failed: {e}", exc_info=True)
+            return Response({"error": "Uniqueness check failed"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return async_to_sync(async_get_logic)()
+        if not conflict:
+            return Response({"exists": False}, status=status.HTTP_200_OK)
+        table, row_id = conflict
+        return Response({"exists": True, "table": table, "id": row_id}, status=status.HTTP_200_OK)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 import pymysql
 import os
+import sys
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -19,6 +20,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
 pymysql.install_as_MySQLdb()
 
+# Modules shared by the Django services (djangoBackend/portal_common)
+sys.path.append(str(BASE_DIR.parent))
+
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -61,6 +65,10 @@ MIDDLEWARE = [
 ]
 
 MIDDLEWARE.insert(0, 'updateserv.middleware.attach_user.AttachUserMiddleware')
+# Before AttachUser, so user_data is built from the verified token
+MIDDLEWARE.insert(0, 'portal_common.jwt_auth.JWTAuthMiddleware')
+# Outermost, so it sees the whole request (Server-Timing / per-request timing log)
+MIDDLEWARE.insert(0, 'portal_common.timing.TimingMiddleware')
 
 ROOT_URLCONF = 'update_service.urls'
 
@@ -118,6 +126,16 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 REST_FRAMEWORK = {
+    # orjson codec with a stdlib fallback (portal_common/renderers.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "portal_common.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "portal_common.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_THROTTLE_CLASSES": [
         "updateserv.throttles.XUserRateThrottle",
         "rest_framework.throttling.AnonRateThrottle",
@@ -128,8 +146,69 @@ REST_FRAMEWORK = {
     },
 }
 
+# --- Caches ---
+# "default" is per-process (throttle history etc.). "shared" must resolve to the same store in
+# every service: it holds the per-table generation counters that writers bump after each write
+# and the read service folds into its response cache keys. The default backend
+# (portal_common/filecache.py) keeps incr atomic and never evicts live keys; in multi-host
+# deployments point SHARED_CACHE_BACKEND / SHARED_CACHE_LOCATION at Redis running without an
+# eviction policy.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": os.getenv("SHARED_CACHE_BACKEND", "portal_common.filecache.SharedFileCache"),
+        "LOCATION": os.getenv("SHARED_CACHE_LOCATION", str(BASE_DIR.parent / ".shared_cache")),
+        "TIMEOUT": None,
+    },
+}
+
+# Read service keeps a caller's reads on the primary this long after their write (X-Last-Write)
+READ_REPLICA_PIN_SECONDS = int(os.getenv("READ_REPLICA_PIN_SECONDS", 5))
+
+# --- Local token verification ---
+# PEM public key (inline or JWT_PUBLIC_KEY_FILE) matching the auth service's JWT_PRIVATE_KEY.
+# When set, portal_common.jwt_auth checks bearer tokens here and X-User comes from the verified
+# claims, so the gateway can skip its /me call (SERVICES_VERIFY_JWT=true there).
+JWT_PUBLIC_KEY_FILE = os.getenv("JWT_PUBLIC_KEY_FILE")
+JWT_PUBLIC_KEY = Path(JWT_PUBLIC_KEY_FILE).read_text() if JWT_PUBLIC_KEY_FILE else os.getenv("JWT_PUBLIC_KEY")
+# How often (seconds) the revoked-token list is topped up from the shared cache
+JWT_DENYLIST_POLL = float(os.getenv("JWT_DENYLIST_POLL", 1.0))
+
+# Password hashing pool (portal_common/hashing.py): worker threads (default one per core) and how many
+# more hashes may wait for one before requests are shed with 503
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", 0)) or None
+HASH_POOL_QUEUE = int(os.getenv("HASH_POOL_QUEUE", 64))
+
+# bcrypt cost policy: the highest rounds whose hash fits BCRYPT_TARGET_MS on this host, between
+# BCRYPT_MIN_ROUNDS and BCRYPT_MAX_ROUNDS, calibrated once and kept in the shared cache for
+# every service (delete its bcrypt-rounds key to recalibrate); BCRYPT_ROUNDS pins it instead.
+# Keep these the same in auth, create and update.
+BCRYPT_TARGET_MS = int(os.getenv("BCRYPT_TARGET_MS", 100))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", 10))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", 14))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 0)) or None
+
+# --- Rate limiting (portal_common/ratelimit.py) ---
+# XUserRateThrottle's counter store: "local" (per process), "shm" (memory-mapped table shared
+# by this host's workers) or "redis" (shared across hosts; needs the redis package)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local")
+RATE_LIMIT_SHM_PATH = os.getenv("RATE_LIMIT_SHM_PATH", str(BASE_DIR / ".ratelimit"))
+RATE_LIMIT_SHM_SLOTS = int(os.getenv("RATE_LIMIT_SHM_SLOTS", 65536))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+
+# Share of requests measured by the timing middleware (Server-Timing header + "myproject.timing"
+# log record). 0 turns it off at the cost of one random() call per request.
+TIMING_SAMPLE_RATE = float(os.getenv("TIMING_SAMPLE_RATE", 0.0))
+
 import os
-LOG_DIR = os.path.join(BASE_DIR, "logs")
+import tempfile
+# LOG_DIR overrides; test runs log to the temp dir so they leave nothing in the tree
+LOG_DIR = os.getenv("LOG_DIR") or (
+    os.path.join(tempfile.gettempdir(), f"{BASE_DIR.name}-test-logs") if sys.argv[1:2] == ["test"]
+    else os.path.join(BASE_DIR, "logs")
+)
 os.makedirs(LOG_DIR, exist_ok=True)
 
 LOGGING = {
@@ -1,10 +1,11 @@
 # update config
 import httpx
 import json
-import bcrypt
+from portal_common.read_service import get_data
 from updateserv.utils.read_service import fetch_record
 from updateserv.utils.uniqueness import check_global_uniqueness_on_update
 from updateserv.exceptions import UniquenessError
+from portal_common.hashing import ahash_password, acheck_password
 
 
 READ_SERVICE_URL = "http://localhost:4000/read/api/get-data" 
@@ -45,11 +46,12 @@ class TableAccess:
                     return False, "Student not found", None
 
                 current_hash = rows[0]["password"]
-                if not bcrypt.checkpw(data["currentPassword"].encode(), current_hash.encode()):
+                matches = await acheck_password(data["currentPassword"], current_hash)
+                if not matches:
                     return False, "Current password is incorrect", None
 
             # hash new password
-            hashed = bcrypt.hashpw(data["newPassword"].encode('utf-8'), bcrypt.gensalt(rounds=10)).decode('utf-8')
+            hashed = await ahash_password(data["newPassword"])
             data["password"] = hashed
             data.pop("newPassword", None)
             data.pop("currentPassword", None)
@@ -88,10 +90,11 @@ class TableAccess:
                     return False, "Teacher not found", None
 
                 current_hash = rows[0]["password"]
-                if not bcrypt.checkpw(data["currentPassword"].encode(), current_hash.encode()):
+                matches = await acheck_password(data["currentPassword"], current_hash)
+                if not matches:
                     return False, "Current password is incorrect", None
 
-            hashed = bcrypt.hashpw(data["newPassword"].encode(), bcrypt.gensalt()).decode()
+            hashed = await ahash_password(data["newPassword"])
             data["password"] = hashed
             data.pop("newPassword", None)
             data.pop("currentPassword", None)
@@ -125,16 +128,11 @@ class TableAccess:
                 return False, "Admin not found", None
 
             current_hash = rows[0]["password"]
-            if not bcrypt.checkpw(
-                data["currentPassword"].encode(),
-                current_hash.encode()
-            ):
+            matches = await acheck_password(data["currentPassword"], current_hash)
+            if not matches:
                 return False, "Current password incorrect", None
 
-            hashed = bcrypt.hashpw(
-                data["newPassword"].encode(),
-                bcrypt.gensalt()
-            ).decode()
+            hashed = await ahash_password(data["newPassword"])
 
             data["password"] = hashed
             data.pop("newPassword", None)
@@ -153,16 +151,14 @@ class TableAccess:
         
         async with httpx.AsyncClient(timeout=10.0) as client:
             try:
-                response = await client.get(
-                    READ_SERVICE_URL,
-                    params={"tableName": "course"},
-                    headers={
+                existing = await get_data(
+                    client,
+                    {"tableName": "course"},
+                    {
                         "X-User": json.dumps(user),
                         "Authorization": token,
                     },
                 )
-                response.raise_for_status()
-                existing = response.json().get('data', [])
 
                 for obj in existing:
                     if obj.get("isDeleted") is not False:
@@ -12,6 +12,7 @@ from updateserv.mixins.access_mixin import AccessMixin
 from updateserv.mixins.update_mixin import UpdateMixin
 from updateserv.throttles import XUserRateThrottle
 from updateserv.exceptions import UniquenessError
+from portal_common.invalidation import record_user_write, LAST_WRITE_HEADER
 
 
 logger = logging.getLogger("myproject")
@@ -84,4 +85,8 @@ class UpdateOne(
 
         # ---------- Perform update ----------
         model = MODEL_MAP[type_]
-        return self.perform_update(model, id, modified, type_, user_id)
+        response = self.perform_update(model, id, modified, type_, user_id)
+        if response.status_code == 200:
+            # Lets the caller's next reads skip replicas that may not have this change yet
+            response[LAST_WRITE_HEADER] = str(record_user_write(user))
+        return response
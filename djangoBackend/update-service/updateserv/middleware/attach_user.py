@@ -1,5 +1,6 @@
 import json
 from django.http import JsonResponse
+from portal_common.renderers import loads
 
 class AttachUserMiddleware:
     def __init__(self, get_response):
@@ -9,7 +10,7 @@ class AttachUserMiddleware:
         user_header = request.headers.get("x-user")
         if user_header:
             try:
-                request.user_data = json.loads(user_header)
+                request.user_data = loads(user_header)
             except Exception:
                 return JsonResponse({"error": "Invalid user header"}, status=400)
         else:
@@ -4,6 +4,7 @@ import logging
 from django.http import JsonResponse
 from asgiref.sync import async_to_sync
 from updateserv.config.table_access import table_access
+from portal_common.hashing import HashingBusy
 
 logger = logging.getLogger("myproject")
 
@@ -17,6 +18,12 @@ class AccessMixin:
             allowed, error, modified = async_to_sync(before_fn)(token, user, id, validated)
             return (allowed, error, modified), None
 
+        except HashingBusy as e:
+            logger.info(f"Pre-update shed for {type_} id={id}: {e}")
+            response = JsonResponse({"error": str(e)}, status=503)
+            response["Retry-After"] = "1"
+            return None, response
+
         except Exception as e:
             logger.error(
                 f"Pre-update check failed for {type_} id={id}: {e}",
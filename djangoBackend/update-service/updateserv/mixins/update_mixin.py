@@ -2,6 +2,7 @@
 
 import logging
 from django.http import JsonResponse
+from portal_common.invalidation import bump_table_generation
 
 logger = logging.getLogger("myproject")
 
@@ -25,5 +26,8 @@ class UpdateMixin:
             )
             return JsonResponse({"error": "Database update failed"}, status=500)
 
+        # Invalidate cached read-service responses for this table
+        bump_table_generation(type_, ids=[id])
+
         logger.info(f"{type_} id={id} updated successfully by user {user_id}")
         return JsonResponse({"message": f"{type_} updated successfully"})
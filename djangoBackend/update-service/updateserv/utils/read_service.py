@@ -1,24 +1,19 @@
 import httpx
-import json
-from django.conf import settings
+import logging
+
+from portal_common.read_service import get_data, read_headers
+
+logger = logging.getLogger("myproject")
 
-# This must be the correct URL, with NO space at the end of the string.
-READ_SERVICE_URL = "http://localhost:4000/read/api/get-data" 
-#                                         ^ NO SPACE HERE
 
 async def fetch_record(table, id, include_password, user, token):
     try:
         async with httpx.AsyncClient() as client:
-            response = await client.get(
-                READ_SERVICE_URL,
-                params={"tableName": table, "id": id, "includePassword": include_password},
-                headers={
-                    "x-user": json.dumps(user),
-                    "Authorization": token
-                }
+            return await get_data(
+                client,
+                {"tableName": table, "id": id, "includePassword": include_password},
+                read_headers(user, token),
             )
-        data = response.json()
-        return data.get("data", [])
     except Exception as e:
-        print("READ-SERVICE ERROR:", e)
+        logger.warning(f"Read service lookup of {table} {id} failed: {e}")
         return None
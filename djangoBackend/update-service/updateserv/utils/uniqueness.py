@@ -1,9 +1,8 @@
 # updateserv/utils/uniqueness.py
-import json
 import httpx
 from updateserv.exceptions import UniquenessError
+from portal_common.read_service import find_user_conflict
 
-READ_SERVICE_URL = "http://localhost:4000/read/api/get-data"
 
 async def check_global_uniqueness_on_update(
     *,
@@ -17,34 +16,15 @@ async def check_global_uniqueness_on_update(
     if not any(f in data for f in fields):
         return
 
-    tables = ["student", "teacher", "admin"]
-
+    # A single indexed EXISTS probe across student/teacher/admin, skipping our own row
     async with httpx.AsyncClient(timeout=10.0) as client:
-        for table in tables:
-            response = await client.get(
-                READ_SERVICE_URL,
-                params={"tableName": table},
-                headers={
-                    "X-User": json.dumps(user),
-                    "Authorization": token,
-                },
-            )
-            response.raise_for_status()
-            rows = response.json().get("data", [])
-
-            for obj in rows:
-                if obj.get("isDeleted") is not False:
-                    continue
-
-                # Skip self
-                if table == current_table and obj.get("id") == int(record_id):
-                    continue
+        conflict = await find_user_conflict(
+            client, user, token, data,
+            exclude_table=current_table,
+            exclude_id=int(record_id),
+        )
 
-                if (
-                    (data.get("email") and obj.get("email") == data["email"]) or
-                    (data.get("phone") and obj.get("phone") == data["phone"]) or
-                    (data.get("cnic") and obj.get("cnic") == data["cnic"])
-                ):
-                    raise UniquenessError(
-                        f"User with same email, phone, or CNIC already exists"
-                    )
+    if conflict:
+        raise UniquenessError(
+            f"User with same email, phone, or CNIC already exists"
+        )